@@ -0,0 +1,126 @@
+# bench/fake_discord.py
+"""Local stand-in for the bits of Discord the bot talks to.
+
+Channels and interaction webhooks answer after an injected latency and can
+be told to fail a fraction of calls with 429s carrying real-looking
+rate-limit headers, so the bot's own limiter/retry code runs unmodified.
+"""
+import random
+import asyncio
+import datetime
+import itertools
+import discord
+
+_ids = itertools.count(10_000)
+
+
+class FakeResponse:
+    def __init__(self, status: int, headers: dict | None = None):
+        self.status = status
+        self.reason = {403: "Forbidden", 429: "Too Many Requests", 500: "Internal Server Error"}.get(status, "Error")
+        self.headers = headers or {}
+
+
+class FakeHTTP:
+    """Shared latency / failure injection for every fake endpoint."""
+
+    def __init__(self, latency=0.02, jitter=0.01, p429=0.0, retry_after=0.1, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.p429 = p429
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.rate_limited = 0
+        self.delivered: list[tuple[str, object]] = []
+
+    async def request(self, route: str, payload, deliver: bool = True):
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        if self.p429 and self.rng.random() < self.p429:
+            self.rate_limited += 1
+            headers = {
+                "Retry-After": str(self.retry_after),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset-After": str(self.retry_after),
+                "X-RateLimit-Bucket": route,
+            }
+            raise discord.HTTPException(FakeResponse(429, headers),
+                                        {"message": "You are being rate limited.", "code": 0})
+        if deliver:
+            self.delivered.append((route, payload))
+
+
+class FakeChannel:
+    def __init__(self, http: FakeHTTP, channel_id: int | None = None, closed: bool = False):
+        self.http = http
+        self.id = channel_id or next(_ids)
+        self.mention = f"<#{self.id}>"
+        self.closed = closed  # a DM channel whose user blocks the bot: every send is a 403
+
+    async def send(self, content=None, **kwargs):
+        if self.closed:
+            await self.http.request(f"channel:{self.id}", None, deliver=False)
+            raise discord.Forbidden(FakeResponse(403), {"message": "Cannot send messages to this user", "code": 50007})
+        await self.http.request(f"channel:{self.id}", content)
+
+
+class FakeUser:
+    def __init__(self):
+        self.id = next(_ids)
+        self.mention = f"<@{self.id}>"
+
+
+class FakeCommand:
+    def __init__(self, name: str):
+        self.name = self.qualified_name = name
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, ephemeral=False, **kwargs):
+        await self._interaction.http.request("interaction", None)
+        self._done = True
+
+    async def send_message(self, content=None, *, embed=None, ephemeral=False, **kwargs):
+        await self._interaction.http.request("interaction", content or embed)
+        self._done = True
+        self._interaction.replied.set()
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self._interaction = interaction
+
+    async def send(self, content=None, *, embed=None, ephemeral=False, **kwargs):
+        await self._interaction.http.request(f"webhook:{self._interaction.id}", content or embed)
+        self._interaction.replied.set()
+
+
+class FakeInteraction:
+    def __init__(self, http: FakeHTTP, command: str):
+        self.http = http
+        self.id = next(_ids)
+        self.command = FakeCommand(command)
+        self.guild_id = None  # resolves to the default guild
+        self.user = FakeUser()
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(self)
+        self.replied = asyncio.Event()
+
+
+class FakeAttachment:
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.size = len(data)
+        self._data = data
+
+    async def read(self) -> bytes:
+        return self._data
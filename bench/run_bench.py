@@ -0,0 +1,259 @@
+# bench/run_bench.py
+"""Offline benchmarks against the local Discord stand-in.
+
+    python -m bench.run_bench --out bench/results.json
+    python -m bench.run_bench --quick --compare bench/results.json
+
+Writes one JSON document: {"meta": {...}, "results": [{"name", "params", "metrics"}]}.
+With --compare, prints the relative change of every metric against an earlier run.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import asyncio
+import platform
+import tempfile
+import datetime
+import tracemalloc
+import statistics
+
+os.environ.setdefault("RIFTS_DB", os.path.join(tempfile.mkdtemp(prefix="rift-bench-"), "rifts.db"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402  (import after RIFTS_DB is pointed at a scratch store)
+from schedule import Schedule  # noqa: E402
+from guilds import GuildConfig  # noqa: E402
+from timeline import fmt_epoch  # noqa: E402
+from ratelimit import RouteLimiter  # noqa: E402
+import ics_import  # noqa: E402
+from bench.fake_discord import FakeHTTP, FakeChannel, FakeInteraction, FakeAttachment  # noqa: E402
+
+HOUR = 3600
+
+
+def _percentiles(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(p / 100 * len(samples)))]  # noqa: E731
+    return {"p50_ms": pick(50) * 1000, "p99_ms": pick(99) * 1000, "mean_ms": statistics.fmean(samples) * 1000}
+
+
+def _load_schedule(n: int):
+    """Replace the bot's schedule with n hourly explicit rifts starting in 2 hours."""
+    start = int(time.time()) // 60 * 60 + 2 * HOUR
+    main.guilds.default.schedule = Schedule([fmt_epoch(start + i * HOUR) for i in range(n)])
+    main.WINDOW_AHEAD_DAYS = n // 24 + 2
+    main.refresh_window(main.guilds.default)
+    main.scheduler.clear()
+
+
+async def bench_schedule_all(n: int) -> dict:
+    _load_schedule(n)
+    tracemalloc.start()
+    started = time.perf_counter()
+    await main.schedule_all_rifts()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": elapsed, "peak_kib": peak / 1024, "reminders": len(main.scheduler)}
+
+
+async def bench_sender(messages: int, channels: int, p429: float, workers: int) -> dict:
+    http = FakeHTTP(latency=0.01, p429=p429, retry_after=0.05)
+    targets = [FakeChannel(http) for _ in range(channels)]
+    main.limiter = RouteLimiter()
+    main.dead_letters.clear()
+    tasks = [asyncio.create_task(main.sender_loop(main.SEND_Q)) for _ in range(workers)]
+    started = time.perf_counter()
+    for i in range(messages):
+        await main.send_safe_message(targets[i % channels], f"bench message {i}")
+    deadline = started + 120
+    while len(http.delivered) + len(main.dead_letters) < messages and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    lost = messages - len(http.delivered)
+    return {"seconds": elapsed, "msgs_per_s": len(http.delivered) / elapsed, "delivered": len(http.delivered),
+            "lost": lost, "loss_ratio": lost / messages, "http_429": http.rate_limited}
+
+
+async def bench_commands(n: int, calls: int) -> dict:
+    _load_schedule(n)
+    await main.schedule_all_rifts()
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    out = {}
+    for name, command in (("nextrift", main.nextrift), ("weeklyrifts", main.weeklyrifts),
+                          ("debug_tasks", main.debug_tasks)):
+        samples = []
+        for _ in range(calls):
+            interaction = FakeInteraction(http, name)
+            started = time.perf_counter()
+            await command.callback(interaction)
+            samples.append(time.perf_counter() - started)
+        out.update({f"{name}_{k}": v for k, v in _percentiles(samples).items()})
+    return out
+
+
+async def bench_guilds(n: int, first_id: int) -> dict:
+    """Set up n guilds, each loading its own default-rule schedule and queueing its reminders."""
+    main.WINDOW_AHEAD_DAYS = 14
+    main.scheduler.clear()
+    before = len(main.guilds)
+    tracemalloc.start()
+    started = time.perf_counter()
+    for guild_id in range(first_id, first_id + n):
+        await main.guilds.configure(GuildConfig(guild_id, guild_id, guild_id, (guild_id,)))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": elapsed, "peak_kib": peak / 1024, "kib_per_guild": peak / 1024 / n,
+            "guilds_loaded": len(main.guilds) - before, "reminders": len(main.scheduler)}
+
+
+async def bench_dm_fanout(subscribers: int, p_closed: float, p429: float, workers: int) -> dict:
+    """One reminder DM'd to every subscriber of a fresh guild through DM_Q."""
+    http = FakeHTTP(latency=0.01, p429=p429, retry_after=0.05)
+    guild_id = next(_fanout_guilds)
+    users = [next(_fanout_users) for _ in range(subscribers)]
+    closed = set(http.rng.sample(users, int(subscribers * p_closed)))
+    for user_id in users:
+        await main.store.subscribe(guild_id, user_id, [HOUR])
+
+    async def fake_open_dm(user_id, channel_id):
+        return FakeChannel(http, closed=user_id in closed)
+
+    main.open_dm = fake_open_dm
+    main.limiter = RouteLimiter()
+    main.dead_letters.clear()
+    tasks = [asyncio.create_task(main.sender_loop(main.DM_Q)) for _ in range(workers)]
+    started = time.perf_counter()
+    remind_time = datetime.datetime.now(datetime.timezone.utc)
+    await main.fan_out_dms("bench", remind_time, await main.store.subscribers(guild_id, HOUR, time.time()), "bench DM")
+    fanout = main.recent_fanouts[-1]
+    deadline = started + 120
+    while fanout.done() + len(main.dead_letters) < subscribers and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    still_reachable = len(await main.store.subscribers(guild_id, HOUR, time.time()))
+    return {"seconds": elapsed, "dms_per_s": fanout.results.get("sent", 0) / elapsed,
+            "sent": fanout.results.get("sent", 0), "closed": fanout.results.get("closed", 0),
+            "lost": len(main.dead_letters), "http_429": http.rate_limited, "reachable_after": still_reachable}
+
+
+_fanout_guilds = iter(range(2_000_000, 3_000_000))
+_fanout_users = iter(range(10**15, 10**16))
+
+
+def _make_ics(events: int, recurring: bool) -> bytes:
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//rift-bench//EN"]
+    base = datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    for i in range(events):
+        start = base + datetime.timedelta(hours=2 + 7 * i)
+        lines += ["BEGIN:VEVENT", f"UID:bench-{i}", f"SUMMARY:Rift {i}",
+                  f"DTSTART:{start.strftime('%Y%m%dT%H%M%SZ')}", "END:VEVENT"]
+    if recurring:
+        lines += ["BEGIN:VEVENT", "UID:bench-rrule", "SUMMARY:Rift cadence",
+                  f"DTSTART:{base.strftime('%Y%m%dT080000Z')}", "RRULE:FREQ=DAILY;INTERVAL=2", "END:VEVENT"]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+async def bench_uploadics(events: int) -> dict:
+    _load_schedule(0)
+    data = _make_ics(events, recurring=True)
+    started = time.perf_counter()
+    found, rejected, truncated = ics_import.parse_ics(data)
+    parse = time.perf_counter() - started
+
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    interaction = FakeInteraction(http, "uploadics")
+    started = time.perf_counter()
+    await main.uploadics.callback(interaction, FakeAttachment("bench.ics", data))
+    command = time.perf_counter() - started
+    return {"bytes": len(data), "occurrences": len(found), "parse_seconds": parse, "command_seconds": command}
+
+
+async def run(quick: bool) -> list[dict]:
+    sizes = [1_000, 10_000] if quick else [1_000, 10_000, 100_000]
+    main.get_text_channel = _fake_get_text_channel
+    results = []
+
+    def record(name, params, metrics):
+        results.append({"name": name, "params": params, "metrics": metrics})
+        print(f"  {name} {params}: " + ", ".join(f"{k}={v:.4g}" for k, v in metrics.items()), file=sys.stderr)
+
+    for n in sizes:
+        record("schedule_all_rifts", {"rifts": n}, await bench_schedule_all(n))
+    for p429 in (0.0, 0.2, 0.5):
+        params = {"messages": 500, "channels": 100, "p429": p429, "workers": main.SENDER_WORKERS}
+        record("sender_loop", params, await bench_sender(**params))
+    for n in sizes:
+        record("commands", {"rifts": n, "calls": 200}, await bench_commands(n, 200))
+    for events in ([200, 1_000] if quick else [200, 1_000, 1_900]):
+        record("uploadics", {"events": events}, await bench_uploadics(events))
+    for p429 in (0.0, 0.2):
+        params = {"subscribers": 2_000, "p_closed": 0.1, "p429": p429, "workers": main.DM_WORKERS}
+        record("dm_fanout", params, await bench_dm_fanout(**params))
+    first_id = 1_000_000  # guild setups persist, so each size gets fresh IDs
+    for n in ([100] if quick else [100, 500]):
+        record("guilds", {"guilds": n}, await bench_guilds(n, first_id))
+        first_id += n
+    return results
+
+
+_fake_http = FakeHTTP(latency=0.0, jitter=0.0)
+_fake_channels: dict[int, FakeChannel] = {}
+
+
+async def _fake_get_text_channel(ch_id: int):
+    if ch_id not in _fake_channels:
+        _fake_channels[ch_id] = FakeChannel(_fake_http, ch_id)
+    return _fake_channels[ch_id]
+
+
+def _key(entry: dict) -> str:
+    return entry["name"] + json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(old: dict, new: dict):
+    previous = {_key(e): e["metrics"] for e in old.get("results", [])}
+    for entry in new["results"]:
+        before = previous.get(_key(entry))
+        if not before:
+            continue
+        for metric, value in entry["metrics"].items():
+            if before.get(metric):
+                change = (value - before[metric]) / before[metric] * 100
+                print(f"{entry['name']:<20} {json.dumps(entry['params'], sort_keys=True):<60} "
+                      f"{metric:<22} {before[metric]:>12.4g} -> {value:>12.4g} ({change:+.1f}%)")
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    parser.add_argument("--quick", action="store_true", help="skip the largest sizes")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.quick))
+    doc = {
+        "meta": {"timestamp": int(time.time()), "python": platform.python_version(),
+                 "platform": platform.platform(), "quick": args.quick},
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), doc)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2)
+    else:
+        print(json.dumps(doc, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,74 @@
+# clock.py
+import time
+import heapq
+import asyncio
+import itertools
+
+
+class SystemClock:
+    """Wall-clock time; the default everywhere."""
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        """Wait for `event` up to `timeout` seconds; True if it was set."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class VirtualClock:
+    """Simulated time that only moves when the driver calls advance_to().
+
+    Sleepers are kept in a heap; advancing jumps straight from one deadline
+    to the next, so months of schedule replay in seconds.
+    """
+
+    def __init__(self, start: float):
+        self._now = float(start)
+        self._timers: list = []
+        self._seq = itertools.count()
+
+    def time(self) -> float:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timers, (self._now + max(0.0, seconds), next(self._seq), fut))
+        await fut
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        if event.is_set():
+            return True
+        sleeper = asyncio.ensure_future(self.sleep(timeout))
+        waiter = asyncio.ensure_future(event.wait())
+        done, pending = await asyncio.wait({sleeper, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        return waiter in done
+
+    @staticmethod
+    async def settle(rounds: int = 20):
+        """Let every runnable task run until it blocks again."""
+        for _ in range(rounds):
+            await asyncio.sleep(0)
+
+    async def advance_to(self, target: float):
+        """Fire every sleeper due up to `target`, in deadline order, then park at `target`."""
+        while True:
+            await self.settle()
+            while self._timers and self._timers[0][2].done():
+                heapq.heappop(self._timers)
+            if not self._timers or self._timers[0][0] > target:
+                break
+            deadline, _, fut = heapq.heappop(self._timers)
+            self._now = max(self._now, deadline)
+            fut.set_result(None)
+        self._now = max(self._now, target)
+        await self.settle()
@@ -0,0 +1,68 @@
+# coalesce.py
+import asyncio
+
+
+class _Batch:
+    __slots__ = ("due", "parts", "sent")
+
+    def __init__(self, due: float):
+        self.due = due
+        self.parts: list = []
+        self.sent = asyncio.get_running_loop().create_future()
+
+
+class Coalescer:
+    """Merge reminders headed for the same key (channel + role) into one send.
+
+    The first reminder opens a batch due at its own deadline; reminders
+    submitted before that batch goes out join it if their deadline is within
+    `window` seconds after it (they are posted up to `window` seconds early).
+    A part can only join if it is submitted before that batch flushes, so
+    callers submit at least `window` seconds ahead of a part's own deadline.
+    flush(key, parts) performs the actual send for a closed batch.
+    """
+
+    def __init__(self, clock, window: float, flush):
+        self.clock = clock
+        self.window = window
+        self._flush = flush
+        self._open: dict[object, list[_Batch]] = {}
+        self.messages = 0
+        self.merged = 0  # reminders that rode along in another reminder's message
+
+    def _find(self, key, due: float) -> _Batch | None:
+        for batch in self._open.get(key, ()):
+            if batch.due <= due <= batch.due + self.window:
+                return batch
+        return None
+
+    async def submit(self, key, due: float, part):
+        """Add `part` to a batch and wait until that batch has been flushed."""
+        batch = self._find(key, due)
+        if batch is None:
+            batch = _Batch(due)
+            self._open.setdefault(key, []).append(batch)
+            asyncio.ensure_future(self._run(key, batch))
+        batch.parts.append(part)
+        try:
+            await asyncio.shield(batch.sent)
+        except asyncio.CancelledError:
+            if not batch.sent.done():
+                batch.parts.remove(part)  # rift moved/removed before the batch went out
+            raise
+
+    async def _run(self, key, batch: _Batch):
+        await self.clock.sleep(batch.due - self.clock.time())
+        batches = self._open.get(key, [])
+        batches.remove(batch)
+        if not batches:
+            self._open.pop(key, None)
+        try:
+            if batch.parts:
+                self.messages += 1
+                self.merged += len(batch.parts) - 1
+                await self._flush(key, list(batch.parts))
+        except Exception as e:
+            batch.sent.set_exception(e)
+        else:
+            batch.sent.set_result(None)
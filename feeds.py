@@ -0,0 +1,84 @@
+# feeds.py
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+
+FEED_EVENT_MINUTES = 30  # calendar entries need a length; rifts don't publish one
+CONTENT_TYPES = {"ics": "text/calendar; charset=utf-8", "json": "application/json"}
+
+
+def _ics_time(epoch: int) -> str:
+    return time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(epoch))
+
+
+def render_ics(guild_id: int, epochs: list[int], name: str = "Umbral Rifts") -> bytes:
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Umbral Rift Bot//Rift schedule//EN",
+             "CALSCALE:GREGORIAN", "METHOD:PUBLISH", f"X-WR-CALNAME:{name}",
+             "REFRESH-INTERVAL;VALUE=DURATION:PT1H", "X-PUBLISHED-TTL:PT1H"]
+    for epoch in epochs:
+        # DTSTAMP = start keeps the body (and so the ETag) identical across rebuilds
+        lines += ["BEGIN:VEVENT", f"UID:rift-{guild_id}-{epoch}@umbral-rift-bot",
+                  f"DTSTAMP:{_ics_time(epoch)}", f"DTSTART:{_ics_time(epoch)}",
+                  f"DURATION:PT{FEED_EVENT_MINUTES}M", "SUMMARY:Umbral Rift", "END:VEVENT"]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+def render_json(guild_id: int, epochs: list[int], rules: list[str]) -> bytes:
+    doc = {"guild": guild_id, "rules": rules,
+           "rifts": [{"start": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(e)), "epoch": e} for e in epochs]}
+    return json.dumps(doc, separators=(",", ":")).encode()
+
+
+class FeedBody:
+    """One serialized feed: plain and gzipped bytes plus a content-hash ETag."""
+
+    __slots__ = ("version", "body", "gzipped", "etag", "content_type")
+
+    def __init__(self, version, body: bytes, content_type: str):
+        self.version = version
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6)
+        self.etag = f'W/"{hashlib.sha1(body).hexdigest()[:16]}"'
+        self.content_type = content_type
+
+
+class FeedCache:
+    """Feeds per (guild, format), rebuilt in a worker thread only when their version changes.
+
+    Concurrent requests for a stale feed share one rebuild.
+    """
+
+    def __init__(self):
+        self._entries: dict[tuple, FeedBody] = {}
+        self._building: dict[tuple, asyncio.Future] = {}
+        self.builds = 0
+        self.hits = 0
+
+    async def get(self, key: tuple, version, prepare) -> FeedBody:
+        """Cached body for key = (guild, format).
+
+        On a miss, `await prepare()` gathers the data on the loop and returns
+        render() -> bytes, which runs (with gzip) in a worker thread.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return entry
+        pending = self._building.get(key + (version,))
+        if pending is None:
+            pending = self._building[key + (version,)] = asyncio.ensure_future(self._build(key[1], version, prepare))
+            pending.add_done_callback(lambda _: self._building.pop(key + (version,), None))
+            self.builds += 1
+        entry = await asyncio.shield(pending)
+        current = self._entries.get(key)
+        if current is None or current.version != version:
+            self._entries[key] = entry
+        return entry
+
+    @staticmethod
+    async def _build(fmt: str, version, prepare) -> FeedBody:
+        render = await prepare()
+        return await asyncio.to_thread(lambda: FeedBody(version, render(), CONTENT_TYPES[fmt]))
@@ -0,0 +1,136 @@
+# guilds.py
+import asyncio
+import collections
+
+from schedule import Schedule, RiftRule
+from timeline import RiftTimeline
+from respcache import ResponseCache
+
+UNDO_DEPTH = 10  # schedule edits /undo_edit can step back through
+
+
+class GuildConfig:
+    """Where and whom one guild's reminders ping, and who may edit its schedule."""
+
+    __slots__ = ("guild_id", "channel_id", "role_id", "editor_roles", "announce_channel_id", "help_channel_id")
+
+    def __init__(self, guild_id: int, channel_id: int, role_id: int, editor_roles=(),
+                 announce_channel_id: int | None = None, help_channel_id: int | None = None):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.role_id = role_id
+        self.editor_roles = tuple(editor_roles)
+        self.announce_channel_id = announce_channel_id
+        self.help_channel_id = help_channel_id
+
+    def to_row(self) -> tuple:
+        return (self.guild_id, self.channel_id, self.role_id, ",".join(map(str, self.editor_roles)),
+                self.announce_channel_id, self.help_channel_id)
+
+    @classmethod
+    def from_row(cls, row) -> "GuildConfig":
+        guild_id, channel_id, role_id, editor_roles, announce_channel_id, help_channel_id = row
+        roles = [int(r) for r in (editor_roles or "").split(",") if r]
+        return cls(guild_id, channel_id, role_id, roles, announce_channel_id, help_channel_id)
+
+
+class GuildState:
+    """Everything one guild keeps in memory: config, schedule, materialized window, reply cache."""
+
+    __slots__ = ("config", "schedule", "timeline", "responses", "history", "archived")
+
+    def __init__(self, config: GuildConfig, schedule: Schedule):
+        self.config = config
+        self.schedule = schedule
+        self.timeline = RiftTimeline()  # only the window around now is materialized
+        self.responses = ResponseCache()  # read-only command replies, invalidated on every schedule change
+        self.history: collections.deque = collections.deque(maxlen=UNDO_DEPTH)  # (label, snapshot) per edit
+        self.archived: tuple[int, ...] = ()  # newest archived rifts, newest first; /lastrift reads this, not the store
+
+    @property
+    def guild_id(self) -> int:
+        return self.config.guild_id
+
+    def refresh_window(self, start: int, end: int):
+        self.timeline.rebuild(self.schedule.window(start, end))
+
+
+def _schedule(rows) -> Schedule:
+    explicit, rules, exceptions = rows
+    return Schedule(explicit, [RiftRule.from_row(row) for row in rules], exceptions)
+
+
+class GuildRegistry:
+    """Per-guild configs and schedules, indexed by guild ID.
+
+    Config rows for every guild are indexed up front (they are tiny);
+    schedules are loaded from the store the first time a guild is used.
+    Guilds that never ran /setup_rifts share the default guild (ID 0),
+    whose config comes from the environment.
+    """
+
+    def __init__(self, store, default_config: GuildConfig, default_rules=(), json_path: str = "rifts.json",
+                 on_load=None):
+        self.store = store
+        self.on_load = on_load  # called with each lazily loaded GuildState
+        self.default_rules = [rule.to_row() for rule in default_rules]
+        self.configs: dict[int, GuildConfig] = {}
+        for row in store.guild_configs():
+            config = GuildConfig.from_row(row)
+            self.configs[config.guild_id] = config
+        self.default = GuildState(default_config, _schedule(store.load(json_path, default_rules=self.default_rules)))
+        self._states: dict[int, GuildState] = {0: self.default}
+        self._loading: dict[int, asyncio.Future] = {}
+
+    def __len__(self):
+        return len(self._states)
+
+    def loaded(self) -> list[GuildState]:
+        return list(self._states.values())
+
+    def get_loaded(self, guild_id: int) -> GuildState | None:
+        return self._states.get(guild_id)
+
+    def resolve(self, guild_id: int | None) -> int:
+        """The guild whose schedule serves `guild_id` (its own, or the default)."""
+        return guild_id if guild_id in self.configs else 0
+
+    async def get(self, guild_id: int | None) -> GuildState:
+        guild_id = self.resolve(guild_id)
+        state = self._states.get(guild_id)
+        if state is not None:
+            return state
+        pending = self._loading.get(guild_id)
+        if pending is None:
+            pending = self._loading[guild_id] = asyncio.ensure_future(
+                self.store.load_guild(guild_id, self.default_rules))
+        try:
+            rows = await asyncio.shield(pending)
+        finally:
+            self._loading.pop(guild_id, None)
+        state = self._states.get(guild_id)
+        if state is None:
+            state = self._states[guild_id] = GuildState(self.configs[guild_id], _schedule(rows))
+            if self.on_load:
+                self.on_load(state)
+        return state
+
+    async def configure(self, config: GuildConfig) -> GuildState:
+        """Save a guild's config (creating its own schedule on first setup)."""
+        await self.store.save_guild(config.to_row())
+        self.configs[config.guild_id] = config
+        state = await self.get(config.guild_id)
+        state.config = config
+        return state
+
+    async def reload(self, state: GuildState):
+        """Pick up schedule edits another process saved for this guild."""
+        state.schedule = _schedule(await self.store.read_guild(state.guild_id))
+        state.responses.invalidate()
+
+    async def load_configured(self, owns=None) -> int:
+        """Load configured guilds' schedules (those `owns(guild_id)` accepts) so their reminders can be queued."""
+        for guild_id in list(self.configs):
+            if owns is None or owns(guild_id):
+                await self.get(guild_id)
+        return len(self._states)
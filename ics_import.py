@@ -0,0 +1,187 @@
+# ics_import.py
+import os
+import re
+import sys
+import json
+import asyncio
+import datetime
+import itertools
+import pytz
+from dateutil import rrule
+from icalendar import Calendar
+
+ICS_MAX_BYTES = int(os.getenv("ICS_MAX_BYTES") or 1_000_000)
+ICS_MAX_EVENTS = int(os.getenv("ICS_MAX_EVENTS") or 2000)
+ICS_MAX_OCCURRENCES = int(os.getenv("ICS_MAX_OCCURRENCES") or 5000)
+ICS_HORIZON_DAYS = int(os.getenv("ICS_HORIZON_DAYS") or 365)
+ICS_PARSE_SECONDS = float(os.getenv("ICS_PARSE_SECONDS") or 10)  # wall-clock limit; the parser process is killed after it
+
+_VEVENT_RE = re.compile(rb"^BEGIN:VEVENT", re.MULTILINE)
+
+
+class IcsRejected(ValueError):
+    """The whole file was refused (too large, too many events, not a calendar)."""
+
+
+class ImportResult:
+    """Validated diff of an upload against the current schedule."""
+
+    def __init__(self):
+        self.added: list[str] = []
+        self.duplicates: list[str] = []
+        self.rejected: list[tuple[str, str]] = []  # (event, reason)
+        self.truncated = False
+
+    def summary(self) -> str:
+        text = (f"➕ {len(self.added)} new · ♻️ {len(self.duplicates)} duplicates · "
+                f"⛔ {len(self.rejected)} rejected")
+        if self.truncated:
+            text += f"\n⚠️ Stopped after {ICS_MAX_OCCURRENCES} occurrences"
+        return text
+
+
+def _to_utc(dt: datetime.datetime) -> datetime.datetime:
+    return pytz.utc.localize(dt) if dt.tzinfo is None else dt.astimezone(pytz.utc)
+
+
+def _exdates(component) -> list[datetime.datetime]:
+    prop = component.get("exdate")
+    if prop is None:
+        return []
+    out = []
+    for group in prop if isinstance(prop, list) else [prop]:
+        for d in group.dts:
+            if isinstance(d.dt, datetime.datetime):
+                out.append(d.dt)
+    return out
+
+
+def _occurrences(component, dtstart: datetime.datetime, since, until):
+    """Lazily yield UTC occurrences of one VEVENT; recurrences stay within since..until."""
+    rule = component.get("rrule")
+    if rule is None:
+        yield _to_utc(dtstart)
+        return
+    rset = rrule.rrulestr(rule.to_ical().decode(), dtstart=dtstart, forceset=True)
+    for ex in _exdates(component):
+        if dtstart.tzinfo is None:
+            rset.exdate(_to_utc(ex).replace(tzinfo=None) if ex.tzinfo else ex)
+        else:
+            rset.exdate(_to_utc(ex))
+    start = since if dtstart.tzinfo is not None else since.replace(tzinfo=None)
+    for occ in rset.xafter(start, inc=True):
+        occ = _to_utc(occ)
+        if occ > until:
+            return
+        yield occ
+
+
+def parse_ics(content: bytes, now: datetime.datetime | None = None,
+              horizon_days: int = ICS_HORIZON_DAYS) -> tuple[list[str], list[tuple[str, str]], bool]:
+    """Blocking parse; the bot runs it through parse_ics_isolated().
+
+    Returns (occurrences as "YYYY-MM-DD HH:MM", rejected events, truncated).
+    Recurring events are expanded from `now` up to the horizon; one-off
+    events are kept regardless of date, like manual uploads always were.
+    """
+    if len(content) > ICS_MAX_BYTES:
+        raise IcsRejected(f"file is larger than {ICS_MAX_BYTES // 1000} kB")
+    if len(_VEVENT_RE.findall(content)) > ICS_MAX_EVENTS:
+        raise IcsRejected(f"file has more than {ICS_MAX_EVENTS} events")
+    try:
+        cal = Calendar.from_ical(content)
+    except ValueError as e:
+        raise IcsRejected(f"not a valid calendar: {e}") from e
+
+    now = now or datetime.datetime.now(pytz.utc)
+    until = now + datetime.timedelta(days=horizon_days)
+    found: list[str] = []
+    rejected: list[tuple[str, str]] = []
+    budget = ICS_MAX_OCCURRENCES
+    for component in cal.walk("VEVENT"):
+        name = str(component.get("summary") or component.get("uid") or "event")
+        prop = component.get("dtstart")
+        if prop is None:
+            rejected.append((name, "missing DTSTART"))
+            continue
+        dtstart = prop.dt
+        if not isinstance(dtstart, datetime.datetime):
+            rejected.append((name, "all-day event"))
+            continue
+        try:
+            occurrences = list(itertools.islice(_occurrences(component, dtstart, now, until), budget + 1))
+        except (ValueError, TypeError) as e:
+            rejected.append((name, f"bad recurrence: {e}"))
+            continue
+        if len(occurrences) > budget:
+            found.extend(o.strftime("%Y-%m-%d %H:%M") for o in occurrences[:budget])
+            return found, rejected, True
+        budget -= len(occurrences)
+        found.extend(o.strftime("%Y-%m-%d %H:%M") for o in occurrences)
+    return found, rejected, False
+
+
+async def parse_ics_isolated(content: bytes, now: datetime.datetime,
+                             timeout: float = ICS_PARSE_SECONDS) -> tuple[list[str], list[tuple[str, str]], bool]:
+    """parse_ics() in a child process, killed after `timeout` seconds.
+
+    The caps bound the output, not the work: an RRULE that can never match
+    (e.g. FREQ=MINUTELY;BYMONTH=2;BYMONTHDAY=30) keeps dateutil searching
+    for many seconds per event. A thread could neither be stopped nor kept
+    off the event loop's GIL; a process can be killed.
+    """
+    if len(content) > ICS_MAX_BYTES:  # don't pipe a file we would refuse anyway
+        raise IcsRejected(f"file is larger than {ICS_MAX_BYTES // 1000} kB")
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), str(now.timestamp()),
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(content), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise IcsRejected(f"took longer than {timeout:.0f}s to parse") from None
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+    if proc.returncode != 0:
+        raise RuntimeError(f"parser exited with {proc.returncode}: {err.decode(errors='replace')[-300:]}")
+    doc = json.loads(out)
+    if "refused" in doc:
+        raise IcsRejected(doc["refused"])
+    if "error" in doc:
+        raise ValueError(doc["error"])
+    return doc["found"], [tuple(r) for r in doc["rejected"]], doc["truncated"]
+
+
+def _child():
+    """`python ics_import.py <now epoch>`: parse stdin, print the result as JSON."""
+    now = datetime.datetime.fromtimestamp(float(sys.argv[1]), pytz.utc)
+    try:
+        found, rejected, truncated = parse_ics(sys.stdin.buffer.read(), now)
+        doc = {"found": found, "rejected": rejected, "truncated": truncated}
+    except IcsRejected as e:
+        doc = {"refused": str(e)}
+    except Exception as e:
+        doc = {"error": f"{type(e).__name__}: {e}"}
+    json.dump(doc, sys.stdout)
+
+
+def diff(found: list[str], rejected, truncated: bool, is_known) -> ImportResult:
+    """Split parsed occurrences into added / duplicates against `is_known`."""
+    result = ImportResult()
+    result.rejected = list(rejected)
+    result.truncated = truncated
+    seen = set()
+    for rift in found:
+        if rift in seen or is_known(rift):
+            result.duplicates.append(rift)
+        else:
+            seen.add(rift)
+            result.added.append(rift)
+    result.added.sort()
+    return result
+
+
+if __name__ == "__main__":
+    _child()
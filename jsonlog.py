@@ -0,0 +1,134 @@
+# jsonlog.py
+"""Structured logging that never blocks the event loop.
+
+Records are put on a bounded in-memory queue by the calling thread and
+written as JSON lines by a background thread, so a slow stdout pipe stalls
+only the writer. When the queue is full, records are dropped and counted
+instead of waiting. Repeats of the same message are sampled: at most
+`burst` per `interval`; the next one that gets through carries a
+"suppressed" count.
+
+    log = logging.getLogger("rift")
+    log.info("💬 reminder sent", extra={"rift": "2025-08-01 20:00", "offset": 900, "lateness": 0.004})
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+
+FIELDS = ("guild", "rift", "offset", "lateness", "route", "count", "reason", "user")
+QUEUE_SIZE = 10_000
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        doc = {"ts": round(record.created, 3), "level": record.levelname.lower(),
+               "logger": record.name, "msg": record.getMessage()}
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                doc[field] = round(value, 3) if isinstance(value, float) else value
+        if getattr(record, "suppressed", 0):
+            doc["suppressed"] = record.suppressed
+        if record.exc_text:
+            doc["exc"] = record.exc_text
+        return json.dumps(doc, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """LOG_FORMAT=text: the message followed by its fields, for reading a local run."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{field}={getattr(record, field)}" for field in FIELDS
+                          if getattr(record, field, None) is not None)
+        if getattr(record, "suppressed", 0):
+            fields += f" (+{record.suppressed} suppressed)"
+        text = f"{record.getMessage()} {fields}".rstrip()
+        return f"{text}\n{record.exc_text}" if record.exc_text else text
+
+
+class Sampler(logging.Filter):
+    """Pass at most `burst` records per message template and level every `interval` seconds.
+
+    Values belong in `extra` fields, not in the message: the message is the key.
+    """
+
+    def __init__(self, burst: int = 20, interval: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows: dict[tuple, list] = {}  # (logger, level, template) -> [start, passed, dropped]
+        self._swept_at = 0.0
+        self._lock = threading.Lock()  # records arrive from the loop and the store thread
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.levelno, str(record.msg))
+        with self._lock:
+            if record.created - self._swept_at >= self.interval:
+                self._sweep(record.created)
+            window = self._windows.get(key)
+            if window is None or record.created - window[0] >= self.interval:
+                if window is not None and window[2]:
+                    record.suppressed = window[2]
+                window = self._windows[key] = [record.created, 0, 0]
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+            return True
+
+    def _sweep(self, now: float):
+        """Forget expired windows; those that dropped records wait to report them on the next repeat."""
+        self._swept_at = now
+        stale = [key for key, (start, _, dropped) in self._windows.items()
+                 if not dropped and now - start >= self.interval]
+        for key in stale:
+            del self._windows[key]
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Formats only what can't cross threads (args, traceback); never blocks on a full queue."""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup(level: str | None = None, fmt: str | None = None, stream=None) -> _QueueHandler:
+    """Route the "rift" logger through the background writer; returns the handler for other loggers."""
+    level = (level or os.getenv("LOG_LEVEL") or "INFO").upper()
+    fmt = fmt or os.getenv("LOG_FORMAT") or "json"
+    q: queue.Queue = queue.Queue(QUEUE_SIZE)
+    handler = _QueueHandler(q)
+    handler.addFilter(Sampler(int(os.getenv("LOG_SAMPLE_BURST") or 20)))
+    out = logging.StreamHandler(stream or sys.stdout)
+    out.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+    listener = logging.handlers.QueueListener(q, out)
+    listener.start()
+    atexit.register(listener.stop)  # flush what is queued on exit
+
+    log = logging.getLogger("rift")
+    log.setLevel(level)
+    log.addHandler(handler)
+    log.propagate = False
+    return handler
@@ -1,31 +1,82 @@
 # keep_alive.py
 import os
-import threading
-from flask import Flask
+import json
+from aiohttp import web
+from metrics import REGISTRY, feed_requests
 
-app = Flask(__name__)
+FEED_MAX_AGE = 300  # seconds clients may reuse a feed before revalidating
 
 
-@app.route("/health")
-def health():
-    return "OK", 200
+async def _ok(request):
+    return web.Response(text="OK")
 
 
-@app.route("/")
-def home():
-    return "OK", 200
+async def _favicon(request):
+    return web.Response(status=204)
 
 
-@app.route("/favicon.ico")
-def favicon():
-    return "", 204
+async def _metrics(request):
+    return web.Response(text=REGISTRY.render(), content_type="text/plain",
+                        headers={"X-Content-Type-Options": "nosniff"})
 
 
-def _run():
-    # Render daje port w env PORT
-    port = int(os.getenv("PORT", "8081"))
-    app.run(host="0.0.0.0", port=port)
+def _health_handler(checks):
+    async def health(request):
+        # checks() -> {name: (ok, detail)}; answering at all proves the loop is running
+        results = checks() if checks else {}
+        healthy = all(ok for ok, _ in results.values())
+        body = {"status": "ok" if healthy else "unhealthy",
+                "checks": {name: {"ok": ok, "detail": detail} for name, (ok, detail) in results.items()}}
+        return web.Response(text=json.dumps(body), status=200 if healthy else 503,
+                            content_type="application/json")
+    return health
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: "*" or any listed tag equal once W/ is ignored."""
+    tags = [tag.strip() for tag in header.split(",")]
+    bare = etag.removeprefix("W/")
+    return "*" in tags or any(tag.removeprefix("W/") == bare for tag in tags)
 
 
-def keep_alive():
-    threading.Thread(target=_run, daemon=True).start()
+def _feed_handler(feeds, fmt: str):
+    async def feed(request):
+        # feeds(guild_id, fmt) -> cached FeedBody, or None for an unknown guild
+        try:
+            guild_id = int(request.query.get("guild", "0"))
+        except ValueError:
+            return web.Response(status=400, text="guild must be a number")
+        entry = await feeds(guild_id, fmt)
+        if entry is None:
+            feed_requests.inc(fmt, "404")
+            return web.Response(status=404, text="unknown guild")
+        headers = {"ETag": entry.etag, "Cache-Control": f"public, max-age={FEED_MAX_AGE}", "Vary": "Accept-Encoding"}
+        if _etag_matches(request.headers.get("If-None-Match", ""), entry.etag):
+            feed_requests.inc(fmt, "304")
+            return web.Response(status=304, headers=headers)
+        body = entry.body
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            body = entry.gzipped
+            headers["Content-Encoding"] = "gzip"
+        feed_requests.inc(fmt, "200")
+        headers["Content-Type"] = entry.content_type
+        return web.Response(body=body, headers=headers)
+    return feed
+
+
+async def keep_alive(checks=None, feeds=None) -> web.AppRunner:
+    """Serve /, /health, /metrics and the schedule feeds on the running (bot) event loop."""
+    app = web.Application()
+    app.router.add_get("/", _ok)
+    app.router.add_get("/health", _health_handler(checks))
+    app.router.add_get("/metrics", _metrics)
+    if feeds:
+        app.router.add_get("/rifts.ics", _feed_handler(feeds, "ics"))
+        app.router.add_get("/rifts.json", _feed_handler(feeds, "json"))
+    app.router.add_get("/favicon.ico", _favicon)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    # Render daje port w env PORT
+    port = int(os.getenv("PORT", "8081"))
+    await web.TCPSite(runner, host="0.0.0.0", port=port).start()
+    return runner
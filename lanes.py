@@ -0,0 +1,79 @@
+# lanes.py
+import time
+import asyncio
+import collections
+
+
+class Lane:
+    """asyncio.Queue with queue-depth and wait-time counters.
+
+    Items are timestamped on put; get() records how long they sat in the lane.
+    A worker that gives up on an item calls on_drop(*args, **kwargs) with the
+    item's own arguments, if set.
+    """
+
+    def __init__(self, name: str, samples: int = 512, on_drop=None):
+        self.name = name
+        self.on_drop = on_drop
+        self._q: asyncio.Queue = asyncio.Queue()
+        self.enqueued = 0
+        self.dequeued = 0
+        self.max_depth = 0
+        self._waits: collections.deque = collections.deque(maxlen=samples)
+
+    def qsize(self) -> int:
+        return self._q.qsize()
+
+    def put_nowait(self, item):
+        self._q.put_nowait((time.monotonic(), item))
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._q.qsize())
+
+    async def put(self, item):
+        self.put_nowait(item)
+
+    async def get(self):
+        queued_at, item = await self._q.get()
+        self.dequeued += 1
+        self._waits.append(time.monotonic() - queued_at)
+        return item
+
+    def task_done(self):
+        self._q.task_done()
+
+    def wait_percentile(self, p: float) -> float:
+        if not self._waits:
+            return 0.0
+        waits = sorted(self._waits)
+        return waits[min(len(waits) - 1, int(p / 100 * len(waits)))]
+
+    def summary(self) -> str:
+        return (f"depth {self.qsize()} (max {self.max_depth}) · sent {self.dequeued} · "
+                f"wait p50 {self.wait_percentile(50) * 1000:.0f}ms / p99 {self.wait_percentile(99) * 1000:.0f}ms")
+
+
+class FanOut:
+    """Progress of one reminder's DM fan-out, for throughput reporting."""
+
+    def __init__(self, label: str, total: int, started: float):
+        self.label = label
+        self.total = total
+        self.started = started
+        self.last = started
+        self.results: dict[str, int] = {}
+
+    def record(self, result: str, now: float):
+        self.results[result] = self.results.get(result, 0) + 1
+        self.last = now
+
+    def done(self) -> int:
+        return sum(self.results.values())
+
+    def rate(self) -> float:
+        elapsed = self.last - self.started
+        return self.done() / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        sent, closed = self.results.get("sent", 0), self.results.get("closed", 0)
+        return (f"{self.label}: {sent}/{self.total} sent, {closed} closed · "
+                f"{self.last - self.started:.1f}s ({self.rate():.0f}/s)")
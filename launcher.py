@@ -0,0 +1,101 @@
+# launcher.py
+"""Run the bot as several worker processes, each owning a block of shards.
+
+    python launcher.py --processes 3 --shards 12
+
+Every worker is main.py with SHARD_COUNT / SHARD_IDS set and its own PORT
+(PORT, PORT+1, ...). DISCORD_GUILD_ID (the server DISCORD_CHANNEL_ID is in)
+must be set: the worker on that server's shard owns the default schedule. A worker that exits is restarted with the same shards
+after a backoff. Reminder leases it held lapse on their own, and the
+delivery ledger in the shared store keeps every reminder to one send.
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+from ratelimit import backoff
+from storage import RiftStore
+
+HEALTHY_RUN_SECONDS = 300  # a worker that lived this long starts its backoff over
+
+
+def assign(shards: int, processes: int) -> list[list[int]]:
+    """Contiguous, near-equal blocks of shard IDs, one per process."""
+    per, extra = divmod(shards, processes)
+    blocks, start = [], 0
+    for i in range(processes):
+        size = per + (1 if i < extra else 0)
+        if size:
+            blocks.append(list(range(start, start + size)))
+        start += size
+    return blocks
+
+
+def spawn(index: int, shard_ids: list[int], shards: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, SHARD_COUNT=str(shards), SHARD_IDS=",".join(map(str, shard_ids)), PORT=str(port + index))
+    print(f"🚀 Worker {index}: shards {shard_ids} on port {port + index}")
+    return subprocess.Popen([sys.executable, "main.py"], env=env)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=int(os.getenv("WORKER_PROCESSES") or 2))
+    parser.add_argument("--shards", type=int, default=int(os.getenv("SHARD_COUNT") or 0),
+                        help="total shard count (default: one per process)")
+    args = parser.parse_args()
+    if not os.getenv("DISCORD_GUILD_ID"):
+        parser.error("DISCORD_GUILD_ID must be set (the server whose shard owns the default schedule)")
+    shards = args.shards or args.processes
+    port = int(os.getenv("PORT", "8081"))
+
+    # Create/migrate the schema once, before the workers race for it
+    RiftStore(os.getenv("RIFTS_DB") or "rifts.db").guild_configs()
+
+    blocks = assign(shards, args.processes)
+    print(f"🧩 {shards} shards over {len(blocks)} processes")
+    workers = {i: spawn(i, block, shards, port) for i, block in enumerate(blocks)}
+    started = {i: time.monotonic() for i in workers}
+    failures = {i: 0 for i in workers}
+    restart_at: dict[int, float] = {}
+
+    def stop(*_):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        while True:
+            time.sleep(1)
+            now = time.monotonic()
+            for i, proc in workers.items():
+                if i in restart_at:
+                    if now >= restart_at[i]:
+                        del restart_at[i]
+                        workers[i] = spawn(i, blocks[i], shards, port)
+                        started[i] = now
+                    continue
+                code = proc.poll()
+                if code is None:
+                    continue
+                if now - started[i] > HEALTHY_RUN_SECONDS:
+                    failures[i] = 0
+                delay = backoff(failures[i], base=2.0)
+                failures[i] += 1
+                restart_at[i] = now + delay
+                print(f"⚠️ Worker {i} (shards {blocks[i]}) exited with {code}; restarting in {delay:.0f}s")
+    except KeyboardInterrupt:
+        print("🛑 Stopping workers")
+        for proc in workers.values():
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in workers.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == "__main__":
+    cli()
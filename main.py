@@ -1,15 +1,32 @@
 # main.py
 import os
-import json
 import pytz
+import time
+import socket
 import random
 import asyncio
+import logging
+import functools
 import datetime
+import collections
 import discord
 from discord import app_commands
 from discord.ext import commands
-from icalendar import Calendar
 from keep_alive import keep_alive
+import feeds
+import metrics
+import jsonlog
+from scheduler import ReminderScheduler
+from clock import SystemClock
+from coalesce import Coalescer
+from watchdog import Watchdog
+from timeline import fmt_epoch, parse_epoch, EPOCH_MIN, EPOCH_MAX
+from ratelimit import RouteLimiter, rate_limit_info, backoff
+from lanes import Lane, FanOut
+from storage import RiftStore
+from schedule import RiftRule
+from guilds import GuildConfig, GuildRegistry, GuildState
+import ics_import
 
 # --- ENV / constants ---
 TOKEN = str(os.getenv("DISCORD_BOT_TOKEN") or "")
@@ -17,44 +34,118 @@ CHANNEL_ID = int(os.getenv("DISCORD_CHANNEL_ID") or 0)
 ROLE_ID = int(os.getenv("DISCORD_ROLE_ID") or 0)
 R5_ROLE_ID = 1380924100742217748
 R4_ROLE_ID = 1380924200985956353
+ANNOUNCE_CHANNEL_ID = 1398208622567227462
+HELP_CHANNEL_ID = 1385418864330014771
+REMINDER_OFFSETS = [3600, 1800, 900, 300]
+SENDER_WORKERS = int(os.getenv("SENDER_WORKERS") or 3)
+FAST_WORKERS = int(os.getenv("FAST_WORKERS") or 2)
+SEND_MAX_ATTEMPTS = 5
+WINDOW_PAST_DAYS = 7
+WINDOW_AHEAD_DAYS = int(os.getenv("WINDOW_AHEAD_DAYS") or 14)
+WINDOW_ROLL_SECONDS = 3600
+LOOP_LAG_UNHEALTHY = 5.0  # seconds
+WATCHDOG_STALL_MS = int(os.getenv("WATCHDOG_STALL_MS") or 250)  # report loop stalls longer than this
+WATCHDOG_RESTART_SECONDS = float(os.getenv("WATCHDOG_RESTART_SECONDS") or 0)  # exit if wedged this long; 0 = never
+PREWARM_SECONDS = int(os.getenv("PREWARM_SECONDS") or 30)  # prepare reminders this early
+COALESCE_SECONDS = int(os.getenv("COALESCE_SECONDS") or 60)  # merge reminders due this close; 0 = same second only
+LEASE_SECONDS = 120  # a claimed reminder must be sent (or released) within prewarm + coalesce window + this
+LEDGER_KEEP_DAYS = 7
+CATCHUP_GRACE_SECONDS = int(os.getenv("CATCHUP_GRACE_SECONDS") or 600)  # after a restart, still send reminders missed by this much
+DM_WORKERS = int(os.getenv("DM_WORKERS") or 8)  # concurrent reminder DMs in flight
+DM_CLOSED_DAYS = 7  # skip members whose DMs are closed for this long (re-subscribing clears it)
+MAX_BULK_DAYS = 366  # widest range a bulk edit may cover, and furthest a rift may be moved
+HISTORY_KEEP_DAYS = WINDOW_PAST_DAYS  # archived rifts stay in the live schedule this long (>= the window's past)
+FEED_PAST_DAYS = 30  # /rifts.ics and /rifts.json cover this much history...
+FEED_AHEAD_DAYS = 90  # ...and this far ahead
+LAST_RIFTS_SHOWN = 3  # /lastrift and /debug_tasks list this many past rifts
+
+# --- sharding (set by launcher.py; unset = one process owning every shard) ---
+SHARD_COUNT = int(os.getenv("SHARD_COUNT") or 0)
+SHARD_IDS = [int(s) for s in (os.getenv("SHARD_IDS") or "").split(",") if s.strip()]
+DEFAULT_GUILD_ID = int(os.getenv("DISCORD_GUILD_ID") or 0)  # home guild of the env config
+LEDGER_WORKER = f"{socket.gethostname()}:{','.join(map(str, SHARD_IDS)) or 'all'}"  # stable across restarts
+LEDGER_OWNER = f"{LEDGER_WORKER}:{os.getpid()}"
+if SHARD_IDS and not DEFAULT_GUILD_ID:
+    raise SystemExit("❌ DISCORD_GUILD_ID must be set when running sharded: "
+                     "it decides which process owns the default schedule")
+
+def owns_guild(guild_id: int) -> bool:
+    """Whether this process queues reminders and edits schedules for `guild_id`.
+
+    Discord routes a guild's events to shard (guild_id >> 22) % shard_count;
+    the env-configured default guild follows DISCORD_GUILD_ID, so its edits
+    arrive in the process that sends its reminders.
+    """
+    if not SHARD_IDS:
+        return True
+    return ((guild_id or DEFAULT_GUILD_ID) >> 22) % SHARD_COUNT in SHARD_IDS
+
+# --- logging (JSON lines from a background thread; LOG_LEVEL / LOG_FORMAT=text) ---
+log_handler = jsonlog.setup()
+log = logging.getLogger("rift")
 
 # --- rifts load/save ---
-def load_rifts():
-    if os.path.exists("rifts.json"):
-        with open("rifts.json", "r") as f:
-            return json.load(f)
-    else:
-        return [
-            "2025-07-30 08:00",
-            "2025-08-01 20:00", "2025-08-03 08:00", "2025-08-05 20:00", "2025-08-07 08:00",
-            "2025-08-09 20:00", "2025-08-11 08:00", "2025-08-13 20:00", "2025-08-15 08:00",
-            "2025-08-17 20:00", "2025-08-19 08:00", "2025-08-21 20:00", "2025-08-23 08:00",
-            "2025-08-25 20:00", "2025-08-27 08:00", "2025-08-29 20:00", "2025-08-31 08:00"
-        ]
-
-def save_rifts():
-    with open("rifts.json", "w") as f:
-        json.dump(rifts, f, indent=4)
+# Every ~48 h, alternating 08:00 / 20:00 UTC; one-off 19:00 rifts are exceptions
+DEFAULT_RULES = [RiftRule("2025-07-30 08:00", 2, ["08:00", "20:00"])]
+store = RiftStore(os.getenv("RIFTS_DB") or "rifts.db")
+# Guild 0 is the env-configured default; other guilds opt in with /setup_rifts
+DEFAULT_CONFIG = GuildConfig(0, CHANNEL_ID, ROLE_ID, (R5_ROLE_ID, R4_ROLE_ID), ANNOUNCE_CHANNEL_ID, HELP_CHANNEL_ID)
 
 # --- discord client ---
 intents = discord.Intents.default()
 intents.message_content = True
-client = commands.Bot(command_prefix="/", intents=intents)
+shard_kwargs = {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS} if SHARD_IDS else {}
+client = commands.AutoShardedBot(command_prefix="/", intents=intents, **shard_kwargs)
 tree = client.tree
 
-rifts = load_rifts()
-scheduled_tasks: dict[str, list[asyncio.Task]] = {}
+clock = SystemClock()  # swapped for a VirtualClock by simulate.py
+scheduler = ReminderScheduler(clock)  # single dispatcher for every guild's reminders, keyed (guild, rift)
+watchdog = Watchdog(WATCHDOG_STALL_MS / 1000, restart_after=WATCHDOG_RESTART_SECONDS or None)
+guilds = GuildRegistry(store, DEFAULT_CONFIG, DEFAULT_RULES, on_load=lambda state: _guild_loaded(state))
 
 # --- helper functions ---
 def utc_parse(s: str) -> datetime.datetime:
     return pytz.utc.localize(datetime.datetime.strptime(s, "%Y-%m-%d %H:%M"))
 
+def utcnow() -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(clock.time(), pytz.utc)
+
 def ts(dt: datetime.datetime) -> int:
     return int(dt.timestamp())
 
 # --- channel cache, send queue, guard on_ready ---
 _channel_cache: dict[int, discord.TextChannel] = {}
-SEND_Q: asyncio.Queue = asyncio.Queue()
+# Items are (route, func, args, kwargs, attempt). Interaction replies get their own
+# lane and workers so they never wait behind reminder/announcement broadcasts.
+SEND_Q = Lane("broadcast")
+FAST_Q = Lane("interaction")
+# subscriber DMs: thousands per reminder, kept off the channel broadcast lane
+DM_Q = Lane("dm", on_drop=lambda fanout, *_: _record_dm(fanout, "failed"))
+limiter = RouteLimiter()
+dead_letters: collections.deque = collections.deque(maxlen=50)  # permanently failed sends
+recent_lateness: collections.deque = collections.deque(maxlen=20)  # (rift, offset, seconds late)
+recent_fanouts: collections.deque = collections.deque(maxlen=5)  # FanOut per DM'd reminder
+metrics.REGISTRY.register(metrics.Gauge(
+    "rift_send_queue_depth", "Items waiting per send lane",
+    lambda: {(lane.name,): lane.qsize() for lane in (FAST_Q, SEND_Q, DM_Q)}, labels=("lane",)))
+metrics.REGISTRY.register(metrics.Gauge(
+    "rift_scheduled_reminders", "Live reminders on the dispatcher heap", lambda: len(scheduler)))
+metrics.REGISTRY.register(metrics.Gauge(
+    "rift_log_dropped_total", "Log records dropped because the writer fell behind", lambda: log_handler.dropped))
+metrics.REGISTRY.register(metrics.Gauge(
+    "rift_guilds_loaded", "Guild schedules held in memory", lambda: len(guilds)))
+
+def _response_cache_lookups() -> dict[tuple, int]:
+    totals: dict[tuple, int] = {}
+    for state in guilds.loaded():
+        for name, (hit, miss) in state.responses.stats().items():
+            totals[(name, "hit")] = totals.get((name, "hit"), 0) + hit
+            totals[(name, "miss")] = totals.get((name, "miss"), 0) + miss
+    return totals
+
+metrics.REGISTRY.register(metrics.Gauge(
+    "rift_response_cache_lookups", "Read-only command cache lookups, all guilds",
+    _response_cache_lookups, labels=("command", "result")))
 _started = False  # prevent duplicate scheduling on reconnect
 
 async def get_text_channel(ch_id: int) -> discord.TextChannel | None:
@@ -73,266 +164,682 @@ async def get_text_channel(ch_id: int) -> discord.TextChannel | None:
         return None
     return None
 
-async def sender_loop():
-    """Send messages through queue (~4 req/s) + retry on 429."""
+def _dead_letter(lane: Lane, route: str, args: tuple, kwargs: dict, reason: str):
+    preview = str(kwargs.get("content") or (args or [""])[0] or "")[:80]
+    dead_letters.append((int(time.time()), route, reason, preview))
+    metrics.send_failed.inc(metrics.route_label(route))
+    log.error("☠️ dropped send", extra={"route": route, "reason": reason})
+    if lane.on_drop is not None:
+        lane.on_drop(*args, **kwargs)
+
+async def sender_loop(lane: Lane):
+    """Lane worker: per-route token buckets, honours retry_after, bounded retry with jitter."""
+    loop = asyncio.get_running_loop()
     while True:
-        func, args, kwargs = await SEND_Q.get()
+        route, func, args, kwargs, attempt = await lane.get()
         try:
+            await limiter.acquire(route)
+            started = time.perf_counter()
             await func(*args, **kwargs)
-        except discord.HTTPException as e:
-            if getattr(e, "status", None) == 429:
-                await asyncio.sleep(5)
-                try:
-                    await func(*args, **kwargs)
-                except Exception:
-                    pass
-        await asyncio.sleep(0.25)  # ~4/s
+            metrics.send_latency.observe(time.perf_counter() - started, metrics.route_label(route))
+        except (discord.HTTPException, discord.RateLimited) as e:
+            status = getattr(e, "status", 429)
+            retry_after, is_global, headers = rate_limit_info(e)
+            limiter.observe(route, headers)
+            if status == 429 or isinstance(e, discord.RateLimited):
+                metrics.send_429.inc(metrics.route_label(route))
+                delay = retry_after if retry_after is not None else backoff(attempt)
+                limiter.rate_limited(route, delay, is_global)
+                delay += backoff(0, base=0.25)  # spread retries of a burst
+            elif status is not None and status >= 500:
+                delay = backoff(attempt)
+            else:
+                _dead_letter(lane, route, args, kwargs, f"HTTP {status}: {e}")
+                continue
+            if attempt + 1 >= SEND_MAX_ATTEMPTS:
+                _dead_letter(lane, route, args, kwargs, f"HTTP {status}: gave up after {attempt + 1} attempts")
+                continue
+            loop.call_later(delay, lane.put_nowait, (route, func, args, kwargs, attempt + 1))
+        except Exception as e:
+            _dead_letter(lane, route, args, kwargs, f"{type(e).__name__}: {e}")
+        finally:
+            lane.task_done()
 
 async def send_safe_message(channel: discord.abc.Messageable, *args, **kwargs):
-    await SEND_Q.put((channel.send, args, kwargs))
+    await SEND_Q.put((f"channel:{getattr(channel, 'id', 0)}", channel.send, args, kwargs, 0))
+
+def _observe_command(interaction: discord.Interaction):
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    metrics.command_latency.observe(time.time() - interaction.created_at.timestamp(), name)
 
 async def respond_safe(interaction: discord.Interaction, content=None, *, embed=None, ephemeral=True):
-    """Safe slash response: defer + followup through queue (reduces 429)."""
+    """Safe slash response: defer + followup through the interaction lane."""
     try:
         if not interaction.response.is_done():
             await interaction.response.defer(ephemeral=ephemeral)
-        async def _send_followup():
-            await interaction.followup.send(content=content, embed=embed, ephemeral=ephemeral)
-        await SEND_Q.put((_send_followup, tuple(), {}))
+        async def _send_followup(**kwargs):
+            await interaction.followup.send(**kwargs)
+            _observe_command(interaction)
+        await FAST_Q.put((
+            f"webhook:{interaction.id}", _send_followup, tuple(),
+            {"content": content, "embed": embed, "ephemeral": ephemeral}, 0,
+        ))
     except discord.HTTPException:
         pass
 
+async def respond_fast(interaction: discord.Interaction, content=None, *, embed=None, ephemeral=True):
+    """Direct reply for cheap read-only commands: one send_message, no defer/followup."""
+    if not interaction.response.is_done():
+        try:
+            await interaction.response.send_message(content=content, embed=embed, ephemeral=ephemeral)
+            _observe_command(interaction)
+            return
+        except discord.HTTPException:
+            pass
+    await respond_safe(interaction, content, embed=embed, ephemeral=ephemeral)
+
 # --- rift schedulers ---
-async def schedule_reminder(remind_time: datetime.datetime, rift_time: datetime.datetime, delta: int):
+MOTIVATIONAL = [
+    # Original lines
+    "🔥 Let's crush this Rift together!",
+    "⚔️ Gear up, team – victory awaits!",
+    "🚀 Push your limits. This is our moment!",
+    "💥 Be legendary – show up and fight!",
+    "🌟 Every Rift is a chance to shine. Let's go!",
+    "🏆 Together we conquer – don't miss it!",
+    "🛡️ This is what we trained for!",
+    "🎯 Focus up! It's Rift time soon!",
+    
+    # New battle-ready lines
+    "💪 Time to show what we're made of!",
+    "⚡ Unleash your power – the Rift calls!",
+    "🗡️ Warriors assemble – glory beckons!",
+    "💫 Make every moment count. Let's dominate!",
+    "🔥 Bring the heat – it's go time!",
+    "⭐ Champions rise to the challenge!",
+    "🏹 Lock and load – victory is ours!",
+    "💢 Maximum effort, maximum rewards!",
+    
+    # Team spirit lines
+    "🤝 Stronger together – let's roll!",
+    "✊ United we stand, divided they fall!",
+    "🎖️ Squad up! Time to make history!",
+    "🤜🤛 One team, one dream – let's get it!",
+    "🫂 Rally the troops – we've got this!",
+    "👥 Together we're unstoppable!",
+    
+    # Pump-up lines
+    "🌪️ Storm the Rift – leave nothing behind!",
+    "🎮 Game face on – it's showtime!",
+    "⏰ The moment has arrived. Own it!",
+    "🔔 Answer the call – greatness awaits!",
+    "🚨 All hands on deck – let's move!",
+    "📢 Sound the alarm – Rift warriors needed!",
+    
+    # Achievement-focused lines
+    "🥇 First place has our name on it!",
+    "📈 Time to climb those leaderboards!",
+    "✨ Write your legend in the Rift!",
+    "🎪 The stage is set – steal the show!",
+    "🏅 Earn your stripes, claim your glory!",
+    "🎊 Make this Rift one to remember!",
+    
+    # Energy/hype lines
+    "🌋 Eruption imminent – get ready to explode!",
+    "⚔️ Sharpen your skills – battle approaches!",
+    "🎸 Let's rock this Rift!",
+    "🔋 Full power! Maximum destruction!",
+    "🌊 Ride the wave to victory!",
+    "☄️ Impact incoming – brace for greatness!",
+    
+    # Confidence boosters
+    "💯 You've got this – now prove it!",
+    "🦁 Roar into battle – show no mercy!",
+    "🏰 Defend our honor, seize the throne!",
+    "⚓ Hold the line – victory is certain!",
+    "🎖️ Heroes are made in moments like these!",
+    "🦅 Soar above the rest – claim your destiny!",
+]
+
+def render_reminder(rift_time: datetime.datetime, delta: int, role_id: int | None) -> str:
+    mention = f"<@&{role_id}> " if role_id is not None else ""  # DMs carry no role ping
+    templates = [
+        (
+            f"{mention}🌀 **Brace yourselves!**\n"
+            f"⏰ Rift begins in **{int(delta/60)} minutes**\n"
+            f"🕐 <t:{ts(rift_time)}:R> | <t:{ts(rift_time)}:t>\n"  # Removed UTC label
+            f"{random.choice(MOTIVATIONAL)}"
+        ),
+        (
+            f"{mention}⚔️ **Prepare for battle!**\n"
+            f"🕰️ Only **{int(delta/60)} minutes** to go!\n"
+            f"📆 <t:{ts(rift_time)}:F>\n"
+            f"{random.choice(MOTIVATIONAL)}"
+        ),
+        (
+            f"{mention}🛡️ **Incoming Rift alert!**\n"
+            f"💣 Rift starts in **{int(delta/60)} minutes**\n"
+            f"⏳ <t:{ts(rift_time)}:R>\n"
+            f"{random.choice(MOTIVATIONAL)}"
+        ),
+        (
+            f"{mention}⚡ **War horns sound!**\n"
+            f"📢 The Rift erupts in **{int(delta/60)} minutes**!\n"
+            f"🕐 <t:{ts(rift_time)}:R>\n"  # Removed (UTC) label
+            f"{random.choice(MOTIVATIONAL)}"
+        ),
+    ]
+    style_index = (ts(rift_time) + delta) % len(templates)
+    return templates[style_index]
+
+def render_merged(reminders: list[tuple[datetime.datetime, int]], role_id: int) -> str:
+    """One ping for several reminders that fall due together."""
+    lines = [f"<@&{role_id}> 🌀 **Rift reminders**"]
+    for rift_time, delta in sorted(reminders):
+        lines.append(f"⏰ <t:{ts(rift_time)}:t> (<t:{ts(rift_time)}:R>) begins in **{int(delta/60)} minutes**")
+    lines.append(random.choice(MOTIVATIONAL))
+    return "\n".join(lines)
+
+def _record_lateness(rift_time: datetime.datetime, delta: int, remind_time: datetime.datetime):
+    lateness = clock.time() - remind_time.timestamp()
+    rift = rift_time.strftime("%Y-%m-%d %H:%M")
+    metrics.reminder_lateness.observe(lateness, str(delta))
+    recent_lateness.append((rift, delta, lateness))
+    log.info("✅ reminder sent", extra={"rift": rift, "offset": delta, "lateness": lateness})
+
+async def send_reminders(key, parts: list):
+    """Coalescer flush: one message for every reminder in the batch.
+
+    parts are (rift_time, delta, remind_time, text, channel, lease); a lone
+    reminder keeps its pre-rendered text.
+    """
+    channel = parts[0][4]
+    route = f"channel:{channel.id}"
+    if len(parts) == 1:
+        text = parts[0][3]
+    else:
+        text = render_merged([(rift_time, delta) for rift_time, delta, *_ in parts], key[1])
+        log.info("💬 sending merged reminders", extra={"route": route, "count": len(parts)})
+        metrics.reminders_coalesced.inc(amount=len(parts) - 1)
+    metrics.reminder_batch_size.observe(len(parts))
+
+    async def _send_reminder(content):
+        await channel.send(content)
+        for rift_time, delta, remind_time, *_ in parts:
+            _record_lateness(rift_time, delta, remind_time)
+        try:
+            await store.mark_sent([part[5] for part in parts], clock.time())
+        except Exception:  # the message is out; never let the ledger trigger a resend
+            log.exception("❌ could not record sent reminders in the ledger", extra={"count": len(parts)})
+
     try:
-        print(f"🕐 Task created: {int(delta/60)}min reminder for {rift_time.strftime('%Y-%m-%d %H:%M')} will fire at {remind_time.strftime('%H:%M:%S')}")
-        await discord.utils.sleep_until(remind_time)
-        print(f"🔔 Task woke up: {int(delta/60)}min reminder for {rift_time.strftime('%Y-%m-%d %H:%M')}")
-        
-        channel = await get_text_channel(CHANNEL_ID)
+        await limiter.acquire(route)
+        await _send_reminder(text)
+    except (discord.HTTPException, discord.RateLimited) as e:
+        log.warning("⚠️ direct send failed, retrying through the queue", extra={"route": route, "reason": str(e)})
+        await SEND_Q.put((route, _send_reminder, (text,), {}, 1))
+
+coalescer = Coalescer(clock, COALESCE_SECONDS, send_reminders)
+
+async def open_dm(user_id: int, channel_id: int | None) -> discord.abc.Messageable:
+    """DM channel for a subscriber; the channel ID is cached in the store so later DMs skip create_dm."""
+    if channel_id:
+        return client.get_partial_messageable(channel_id, type=discord.ChannelType.private)
+    user = client.get_user(user_id) or await client.fetch_user(user_id)
+    dm = await user.create_dm()
+    await store.set_dm_channel(user_id, dm.id)
+    return dm
+
+async def _send_dm(fanout: FanOut, user_id: int, channel_id: int | None, content: str):
+    """One subscriber DM. Closed DMs are recorded and skipped for DM_CLOSED_DAYS, never retried."""
+    try:
+        channel = await open_dm(user_id, channel_id)
+        await channel.send(content)
+    except (discord.Forbidden, discord.NotFound):
+        result = "closed"
+        await store.mark_dm_closed(user_id, clock.time() + DM_CLOSED_DAYS * 86400)
+    except discord.HTTPException as e:
+        if e.status == 429 or e.status >= 500:
+            raise  # sender_loop backs off and retries
+        result = "failed"
+    else:
+        result = "sent"
+    _record_dm(fanout, result)
+
+def _record_dm(fanout: FanOut, result: str):
+    """Count one DM's outcome; a DM sender_loop gives up on is recorded here too, as "failed"."""
+    fanout.record(result, clock.time())
+    metrics.dm_sent.inc(result)
+    if fanout.done() == fanout.total:
+        metrics.dm_fanout_rate.observe(fanout.rate())
+        log.info("📨 DM fan-out done", extra={"count": fanout.total, "reason": fanout.summary()})
+
+async def fan_out_dms(label: str, remind_time: datetime.datetime, subscribers: list, content: str):
+    """At remind_time, queue one DM per subscriber on DM_Q.
+
+    DM_WORKERS bounds how many are in flight; each DM channel is its own
+    limiter route, so 429s back off per member while the global bucket
+    caps the total rate.
+    """
+    await clock.sleep(remind_time.timestamp() - clock.time())
+    fanout = FanOut(label, len(subscribers), clock.time())
+    recent_fanouts.append(fanout)
+    for user_id, channel_id in subscribers:
+        DM_Q.put_nowait((f"dm:{user_id}", _send_dm, (fanout, user_id, channel_id, content), {}, 0))
+    log.info("📨 queued reminder DMs", extra={"count": len(subscribers), "reason": label})
+
+async def schedule_reminder(guild_id: int, remind_time: datetime.datetime, rift_time: datetime.datetime, delta: int):
+    """Fired by the dispatcher PREWARM_SECONDS + COALESCE_SECONDS before remind_time.
+
+    Phase 1 claims the send lease, resolves the channel, looks up DM
+    subscribers and renders the text ahead of time; phase 2 hands it to the
+    coalescer, which posts directly (not behind SEND_Q) the moment
+    remind_time arrives, merged with any reminder due just after it, while
+    the subscriber DMs fan out on DM_Q. Handing over COALESCE_SECONDS early
+    is what lets a reminder due up to that much later join the batch.
+    """
+    label = f"{int(delta/60)}min reminder for {rift_time.strftime('%Y-%m-%d %H:%M')}"
+    if guild_id:
+        label += f" in guild {guild_id}"
+    lease = (guild_id, rift_time.strftime("%Y-%m-%d %H:%M"), delta)
+    fields = {"guild": guild_id, "rift": lease[1], "offset": delta}
+    claimed = False
+    dm_task = None
+    try:
+        log.debug("🔔 preparing reminder", extra=fields)
+        state = guilds.get_loaded(guild_id)
+        if state is None:
+            return
+        # Exactly once across processes, restarts and reconnects: whoever claims it sends it
+        claimed = await store.claim(lease, LEDGER_OWNER, clock.time(),
+                                   PREWARM_SECONDS + COALESCE_SECONDS + LEASE_SECONDS)
+        if not claimed:
+            log.info("⏭️ skipping reminder: already sent or claimed by another process", extra=fields)
+            return
+        subscribers = await store.subscribers(guild_id, delta, clock.time())
+        if subscribers:
+            dm_text = render_reminder(rift_time, delta, None) + "\n-# `/unsubscribe` to stop these DMs"
+            dm_task = asyncio.ensure_future(fan_out_dms(label, remind_time, subscribers, dm_text))
+        config = state.config
+        channel = await get_text_channel(config.channel_id)
         if not channel:
-            print(f"❌ Channel {CHANNEL_ID} not found for {int(delta/60)}min reminder")
+            log.error("❌ reminder channel not found", extra=dict(fields, route=f"channel:{config.channel_id}"))
+            if dm_task is None:
+                await store.release([lease], LEDGER_OWNER)
+                return
+            await dm_task  # the DMs still go out, and count as this reminder's delivery
+            await store.mark_sent([lease], clock.time())
             return
-
-        motivational = [
-            # Original lines
-            "🔥 Let's crush this Rift together!",
-            "⚔️ Gear up, team – victory awaits!",
-            "🚀 Push your limits. This is our moment!",
-            "💥 Be legendary – show up and fight!",
-            "🌟 Every Rift is a chance to shine. Let's go!",
-            "🏆 Together we conquer – don't miss it!",
-            "🛡️ This is what we trained for!",
-            "🎯 Focus up! It's Rift time soon!",
-            
-            # New battle-ready lines
-            "💪 Time to show what we're made of!",
-            "⚡ Unleash your power – the Rift calls!",
-            "🗡️ Warriors assemble – glory beckons!",
-            "💫 Make every moment count. Let's dominate!",
-            "🔥 Bring the heat – it's go time!",
-            "⭐ Champions rise to the challenge!",
-            "🏹 Lock and load – victory is ours!",
-            "💢 Maximum effort, maximum rewards!",
-            
-            # Team spirit lines
-            "🤝 Stronger together – let's roll!",
-            "✊ United we stand, divided they fall!",
-            "🎖️ Squad up! Time to make history!",
-            "🤜🤛 One team, one dream – let's get it!",
-            "🫂 Rally the troops – we've got this!",
-            "👥 Together we're unstoppable!",
-            
-            # Pump-up lines
-            "🌪️ Storm the Rift – leave nothing behind!",
-            "🎮 Game face on – it's showtime!",
-            "⏰ The moment has arrived. Own it!",
-            "🔔 Answer the call – greatness awaits!",
-            "🚨 All hands on deck – let's move!",
-            "📢 Sound the alarm – Rift warriors needed!",
-            
-            # Achievement-focused lines
-            "🥇 First place has our name on it!",
-            "📈 Time to climb those leaderboards!",
-            "✨ Write your legend in the Rift!",
-            "🎪 The stage is set – steal the show!",
-            "🏅 Earn your stripes, claim your glory!",
-            "🎊 Make this Rift one to remember!",
-            
-            # Energy/hype lines
-            "🌋 Eruption imminent – get ready to explode!",
-            "⚔️ Sharpen your skills – battle approaches!",
-            "🎸 Let's rock this Rift!",
-            "🔋 Full power! Maximum destruction!",
-            "🌊 Ride the wave to victory!",
-            "☄️ Impact incoming – brace for greatness!",
-            
-            # Confidence boosters
-            "💯 You've got this – now prove it!",
-            "🦁 Roar into battle – show no mercy!",
-            "🏰 Defend our honor, seize the throne!",
-            "⚓ Hold the line – victory is certain!",
-            "🎖️ Heroes are made in moments like these!",
-            "🦅 Soar above the rest – claim your destiny!",
-        ]
-        templates = [
-            (
-                f"<@&{ROLE_ID}> 🌀 **Brace yourselves!**\n"
-                f"⏰ Rift begins in **{int(delta/60)} minutes**\n"
-                f"🕐 <t:{ts(rift_time)}:R> | <t:{ts(rift_time)}:t>\n"  # Removed UTC label
-                f"{random.choice(motivational)}"
-            ),
-            (
-                f"<@&{ROLE_ID}> ⚔️ **Prepare for battle!**\n"
-                f"🕰️ Only **{int(delta/60)} minutes** to go!\n"
-                f"📆 <t:{ts(rift_time)}:F>\n"
-                f"{random.choice(motivational)}"
-            ),
-            (
-                f"<@&{ROLE_ID}> 🛡️ **Incoming Rift alert!**\n"
-                f"💣 Rift starts in **{int(delta/60)} minutes**\n"
-                f"⏳ <t:{ts(rift_time)}:R>\n"
-                f"{random.choice(motivational)}"
-            ),
-            (
-                f"<@&{ROLE_ID}> ⚡ **War horns sound!**\n"
-                f"📢 The Rift erupts in **{int(delta/60)} minutes**!\n"
-                f"🕐 <t:{ts(rift_time)}:R>\n"  # Removed (UTC) label
-                f"{random.choice(motivational)}"
-            ),
-        ]
-        style_index = (ts(rift_time) + delta) % len(templates)
-        
-        print(f"💬 Sending {int(delta/60)}min reminder for {rift_time.strftime('%Y-%m-%d %H:%M')}")
-        await send_safe_message(channel, templates[style_index])
-        print(f"✅ Successfully sent {int(delta/60)}min reminder for {rift_time.strftime('%Y-%m-%d %H:%M')}")
+        text = render_reminder(rift_time, delta, config.role_id)
+        await coalescer.submit((channel.id, config.role_id), remind_time.timestamp(),
+                               (rift_time, delta, remind_time, text, channel, lease))
+        if dm_task is not None:
+            await dm_task
         
-    except Exception as e:
-        print(f"❌ Error in {int(delta/60)}min reminder for {rift_time.strftime('%Y-%m-%d %H:%M')}: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        # Always clean up, even if there was an error
-        rift_str = rift_time.strftime("%Y-%m-%d %H:%M")
-        tasks = scheduled_tasks.get(rift_str, [])
-        current_task = asyncio.current_task()
-        if current_task in tasks:
-            tasks.remove(current_task)
-            print(f"🧹 Cleaned up {int(delta/60)}min reminder task for {rift_time.strftime('%Y-%m-%d %H:%M')}")
-        if not tasks:
-            scheduled_tasks.pop(rift_str, None)
-
-async def schedule_all_rifts():
-    # Cancel all existing tasks before clearing
-    for rift_str, tasks in scheduled_tasks.items():
-        for task in tasks:
-            if not task.cancelled():
-                task.cancel()
-                print(f"🚫 Cancelled old task for {rift_str}")
-    
-    scheduled_tasks.clear()
-    
-    now = datetime.datetime.now(pytz.utc)
-    for rift_time_str in rifts:
-        rift_time = utc_parse(rift_time_str)
-        for delta in [3600, 1800, 900, 300]:
-            remind_time = rift_time - datetime.timedelta(seconds=delta)
-            if remind_time > now:
-                t = asyncio.create_task(schedule_reminder(remind_time, rift_time, delta))
-                scheduled_tasks.setdefault(rift_time_str, []).append(t)
+    except asyncio.CancelledError:
+        log.info("🚫 reminder cancelled", extra=fields)
+        if dm_task is not None:
+            dm_task.cancel()
+        if claimed:
+            asyncio.ensure_future(store.release([lease], LEDGER_OWNER))
+        raise
+    except Exception:
+        log.exception("❌ reminder failed", extra=fields)
+
+def schedule_rift(state: GuildState, rift_time_str: str, now: datetime.datetime,
+                  grace: float = 0, delivered=frozenset()) -> int:
+    """Push the missing reminders of one rift onto the dispatcher heap.
+
+    Future reminders are always queued. With `grace`, the latest reminder
+    missed by at most that many seconds is queued too (it fires at once),
+    unless the ledger says it was `delivered` already or a later reminder
+    of the same rift is still to come.
+    """
+    rift_time = utc_parse(rift_time_str)
+    key = (state.guild_id, rift_time_str)
+    count = 0
+    stale = False  # a later reminder of this rift is queued, sent or caught up: older missed ones are moot
+    for delta in sorted(REMINDER_OFFSETS):
+        remind_time = rift_time - datetime.timedelta(seconds=delta)
+        if scheduler.has(key, delta) or (rift_time_str, delta) in delivered:
+            stale = True
+            continue
+        if remind_time <= now:
+            if stale or (now - remind_time).total_seconds() > grace:
+                continue
+            metrics.reminders_caught_up.inc()
+            log.info("⏪ catching up missed reminder",
+                     extra={"guild": state.guild_id, "rift": rift_time_str, "offset": delta,
+                            "lateness": (now - remind_time).total_seconds()})
+        scheduler.schedule(remind_time.timestamp() - PREWARM_SECONDS - COALESCE_SECONDS, key, delta,
+                           schedule_reminder, state.guild_id, remind_time, rift_time, delta)
+        stale = True
+        count += 1
+    return count
+
+def refresh_window(state: GuildState, now: float | None = None):
+    """Materialize [now - past, now + ahead] of a guild's schedule into its timeline."""
+    now = int(now or clock.time())
+    state.refresh_window(now - WINDOW_PAST_DAYS * 86400, now + WINDOW_AHEAD_DAYS * 86400)
+
+refresh_window(guilds.default)
+
+def upcoming_rifts(state: GuildState, now: datetime.datetime) -> list[str]:
+    return [fmt_epoch(epoch) for epoch in state.timeline.upcoming(now.timestamp())]
+
+def reconcile(state: GuildState, old, new, now: datetime.datetime | None = None,
+              grace: float = 0, delivered=frozenset()) -> tuple[int, int]:
+    """Diff two versions of a guild's schedule and only add/cancel reminders for rifts that changed.
+
+    Reminders of rifts present in both are left queued untouched.
+    Returns (reminders added, reminders cancelled).
+    """
+    if not owns_guild(state.guild_id):
+        return 0, 0  # another shard process sends this guild's reminders
+    now = now or utcnow()
+    old_set, new_set = set(old), set(new)
+    cancelled = sum(scheduler.cancel_rift((state.guild_id, r)) for r in old_set - new_set)
+    # Catch-up revisits every rift: a missed reminder leaves no trace on the heap
+    targets = new_set if grace else new_set - old_set
+    added = sum(schedule_rift(state, r, now, grace, delivered) for r in targets)
+    if added or cancelled:
+        log.info("🔁 reconciled schedule", extra={"guild": state.guild_id, "reason": f"+{added} / -{cancelled} reminders"})
+    return added, cancelled
+
+def _guild_loaded(state: GuildState):
+    """A guild's schedule was just loaded: materialize its window and queue its reminders."""
+    refresh_window(state)
+    reconcile(state, [], upcoming_rifts(state, utcnow()))
+
+async def apply_schedule_change(state: GuildState, now: datetime.datetime | None = None,
+                                undo: tuple | None = None) -> tuple[int, int]:
+    """After mutating `state.schedule`: persist it, re-materialize the window, reconcile reminders.
+
+    However many rifts the edit touched, that is one store transaction and
+    one reconcile. `undo` is (label, snapshot taken before the edit), kept
+    for /undo_edit when the edit changed anything.
+    """
+    now = now or utcnow()
+    old_upcoming = upcoming_rifts(state, now)
+    refresh_window(state, now.timestamp())
+    state.responses.invalidate()
+    changes = state.schedule.drain_changes()
+    await store.apply(changes, state.guild_id)
+    if undo and changes:
+        state.history.append(undo)
+    return reconcile(state, old_upcoming, upcoming_rifts(state, now), now)
+
+async def archive_past(state: GuildState, now: float | None = None) -> int:
+    """Append rifts that have passed to the history store, then drop explicit
+    dates and exceptions older than HISTORY_KEEP_DAYS from the live schedule."""
+    now = int(now or clock.time())
+    since = await store.archived_until(state.guild_id)
+    start = since + 1 if since is not None else state.schedule.first()
+    passed = state.schedule.window(start, now) if start is not None else []
+    cutoff = now - HISTORY_KEEP_DAYS * 86400
+    rows = [(epoch, int(state.schedule.is_explicit(epoch))) for epoch in passed]
+    archived = await store.archive(state.guild_id, rows, now, cutoff)
+    dropped = state.schedule.forget_before(cutoff)
+    state.archived = tuple(await store.last_rifts(state.guild_id, LAST_RIFTS_SHOWN))
+    if archived or dropped:
+        log.info("🗄️ archived past rifts", extra={"guild": state.guild_id, "count": archived,
+                                                   "reason": f"{dropped} old entries dropped from the live schedule"})
+    return archived
+
+async def rifts_between(state: GuildState, start: int, end: int) -> list[int]:
+    """Every rift in [start, end], past ones included: from the history up to where it is
+    archived (the live schedule has forgotten the exceptions there), the live schedule after."""
+    since = await store.archived_until(state.guild_id)
+    if since is None or since < start:
+        return state.schedule.window(start, end)
+    return (await store.history_between(state.guild_id, start, min(since, end))
+            + state.schedule.window(since + 1, end))
+
+async def window_loop():
+    """Roll every loaded guild's window forward so reminders enter the heap in time.
+
+    Guilds owned by another shard process are only read here, so re-read
+    their schedule to pick up that process's edits.
+    """
+    while True:
+        await clock.sleep(WINDOW_ROLL_SECONDS)
+        for state in guilds.loaded():
+            try:
+                if owns_guild(state.guild_id):
+                    await archive_past(state)
+                    await apply_schedule_change(state)
+                else:
+                    await guilds.reload(state)
+                    refresh_window(state)
+                    state.archived = tuple(await store.last_rifts(state.guild_id, LAST_RIFTS_SHOWN))
+            except Exception:
+                log.exception("[window_loop] guild refresh failed", extra={"guild": state.guild_id})
+        try:
+            await store.prune_deliveries(fmt_epoch(int(clock.time()) - LEDGER_KEEP_DAYS * 86400))
+        except Exception:
+            log.exception("[window_loop] ledger prune failed")
+
+async def schedule_all_rifts(grace: float = 0) -> tuple[int, int]:
+    """Bring the dispatcher in line with every loaded guild's timeline (idempotent).
+
+    With `grace`, reminders missed by up to that many seconds (e.g. while the
+    bot was down) are caught up, skipping any the delivery ledger has as sent.
+    """
+    now = utcnow()
+    queued: dict[int, list[str]] = {}
+    for guild_id, rift in scheduler.rifts():
+        queued.setdefault(guild_id, []).append(rift)
+    added = cancelled = 0
+    for state in guilds.loaded():
+        delivered = frozenset()
+        if grace and owns_guild(state.guild_id):
+            delivered = await store.delivered(state.guild_id, fmt_epoch(int(now.timestamp())))
+        a, c = reconcile(state, queued.get(state.guild_id, ()), upcoming_rifts(state, now), now, grace, delivered)
+        added, cancelled = added + a, cancelled + c
+    return added, cancelled
+
+async def warm_start() -> tuple[int, int]:
+    """First start of this process: free what a previous incarnation left claimed, then catch up."""
+    released = await store.release_previous(LEDGER_WORKER, LEDGER_OWNER)
+    if released:
+        log.info("♻️ released reminder leases left unsent by a previous run", extra={"count": released})
+    await guilds.load_configured(owns_guild)
+    for state in guilds.loaded():
+        if owns_guild(state.guild_id):
+            await archive_past(state)
+    return await schedule_all_rifts(CATCHUP_GRACE_SECONDS)
 
 # --- events ---
+def health_checks() -> dict[str, tuple[bool, str]]:
+    """Liveness for /health: gateway connected, loop responsive, dispatcher alive."""
+    lag = metrics.last_loop_lag()
+    connected = client.is_ready() and not client.is_closed()
+    return {
+        "gateway": (connected, f"latency {client.latency * 1000:.0f}ms" if connected else "not connected"),
+        "event_loop": (lag < LOOP_LAG_UNHEALTHY, f"lag {lag * 1000:.0f}ms"),
+        "dispatcher": (scheduler.is_alive(), f"{len(scheduler)} reminders pending for {len(guilds)} guilds"),
+    }
+
+feed_cache = feeds.FeedCache()
+
+async def schedule_feed(guild_id: int, fmt: str) -> feeds.FeedBody | None:
+    """Cached ICS/JSON feed of a guild's rifts; rebuilt (off the loop) after schedule edits or a day roll."""
+    if guild_id and guild_id not in guilds.configs:
+        return None
+    state = await guilds.get(guild_id)
+    now = int(clock.time())
+
+    async def prepare():
+        # Read the schedule here on the loop (it may change under a thread); serializing runs in one
+        epochs = await rifts_between(state, now - FEED_PAST_DAYS * 86400, now + FEED_AHEAD_DAYS * 86400)
+        if fmt == "ics":
+            return functools.partial(feeds.render_ics, state.guild_id, epochs)
+        return functools.partial(feeds.render_json, state.guild_id, epochs,
+                                 [rule.describe() for rule in state.schedule.rules])
+
+    return await feed_cache.get((state.guild_id, fmt), (state.responses.version, now // 86400), prepare)
+
+async def setup_hook():
+    # Runs on the loop client.run drives, before the gateway connects
+    watchdog.start()
+    await keep_alive(health_checks, schedule_feed)
+
+client.setup_hook = setup_hook
+
 @client.event
 async def on_ready():
     global _started
-    print(f"✅ Bot is online as {client.user}")
+    log.info("✅ Bot is online", extra={"user": str(client.user)})
     
     if not _started:
         _started = True
-        client.loop.create_task(sender_loop())
-        try:
-            await tree.sync()
-            print("✅ Synced slash commands")
-        except Exception as e:
-            print(f"[tree.sync] error: {e}")
+        for _ in range(FAST_WORKERS):
+            client.loop.create_task(sender_loop(FAST_Q))
+        for _ in range(SENDER_WORKERS):
+            client.loop.create_task(sender_loop(SEND_Q))
+        for _ in range(DM_WORKERS):
+            client.loop.create_task(sender_loop(DM_Q))
+        scheduler.start()
+        client.loop.create_task(window_loop())
+        client.loop.create_task(metrics.monitor_loop_lag())
+        if owns_guild(0):  # commands are global; one process syncing them is enough
+            try:
+                await tree.sync()
+                log.info("✅ Synced slash commands")
+            except Exception:
+                log.exception("[tree.sync] failed")
         
         # Schedule tasks only on first start
         try:
-            print("🔄 Scheduling rift reminders...")
-            await schedule_all_rifts()
-            print(f"✅ Scheduled tasks for {len(scheduled_tasks)} rifts")
-        except Exception as e:
-            print(f"[schedule_all_rifts] error: {e}")
+            log.info("🔄 Scheduling rift reminders...")
+            await warm_start()
+            log.info("✅ Scheduled reminders", extra={"count": len(scheduler),
+                                                     "reason": f"{scheduler.rift_count()} rifts in {len(guilds)} guilds"})
+        except Exception:
+            log.exception("[schedule_all_rifts] failed")
     else:
-        # On reconnect, only reschedule if we've lost tasks
-        active_task_count = sum(
-            len([t for t in tasks if not t.cancelled()]) 
-            for tasks in scheduled_tasks.values()
-        )
-        if active_task_count == 0:
-            print("⚠️ No active tasks found on reconnect, rescheduling...")
-            await schedule_all_rifts()
-            print(f"✅ Rescheduled tasks for {len(scheduled_tasks)} rifts")
-        else:
-            print(f"📊 Reconnected with {active_task_count} active tasks still running")
+        # On reconnect, only reschedule if we've lost reminders
+        if not scheduler.is_alive():
+            log.warning("⚠️ Reminder dispatcher was not running, restarting...")
+            scheduler.start()
+        # Only fill in what is missing; queued reminders are kept as-is
+        added, cancelled = await schedule_all_rifts(CATCHUP_GRACE_SECONDS)
+        log.info("📊 Reconnected", extra={"count": len(scheduler), "reason": f"+{added} / -{cancelled} reminders"})
 
 # --- commands ---
 
+def editor_only():
+    """has_any_role against the invoking guild's own editor (R5/R4) roles."""
+    async def predicate(interaction: discord.Interaction) -> bool:
+        state = await guilds.get(interaction.guild_id)
+        roles = state.config.editor_roles
+        if isinstance(interaction.user, discord.Member) and any(r.id in roles for r in interaction.user.roles):
+            return True
+        raise app_commands.MissingAnyRole(list(roles))
+    return app_commands.check(predicate)
+
+class NotScheduleOwner(app_commands.CheckFailure):
+    """The guild's reminders are queued by another shard process, which would never see the edit."""
+
+def schedule_owner():
+    """Schedule edits only in the process that queues the guild's reminders."""
+    async def predicate(interaction: discord.Interaction) -> bool:
+        state = await guilds.get(interaction.guild_id)
+        if owns_guild(state.guild_id):
+            return True
+        raise NotScheduleOwner()
+    return app_commands.check(predicate)
+
+async def _check_failed(interaction: discord.Interaction, error) -> bool:
+    """Reply to a failed editor_only/schedule_owner check; False for any other error."""
+    if isinstance(error, app_commands.errors.MissingAnyRole):
+        await respond_safe(interaction, "You don't have permission to use this command.", ephemeral=True)
+    elif isinstance(error, NotScheduleOwner):
+        await respond_safe(interaction, "⚠️ This server's schedule is managed by another bot process; "
+                                        "nothing was changed.", ephemeral=True)
+    else:
+        return False
+    return True
+
+def _next_rift_reply(state: GuildState):
+    rift_ts = state.timeline.next_after(clock.time())
+    if rift_ts is None:
+        return "No upcoming Rift found.", None
+    return f"🌀 The next Rift is <t:{rift_ts}:F>\n⏳ <t:{rift_ts}:R>", rift_ts
+
+def _weekly_reply(state: GuildState):
+    now = clock.time()
+    upcoming = state.timeline.between(now, now + 7 * 86400)
+    # Stale once the first listed rift passes or the next one enters the 7-day window
+    expiries = [upcoming[0] + 1] if upcoming else []
+    entering = state.timeline.next_after(now + 7 * 86400)
+    if entering is not None:
+        expiries.append(entering - 7 * 86400)
+    expires = min(expiries, default=None)
+    if not upcoming:
+        return "No Rifts scheduled for the next 7 days.", expires
+    return "📅 Rifts this week:\n" + "\n".join(f"<t:{rift_ts}:F>" for rift_ts in upcoming), expires
+
+def _past_rifts(state: GuildState, now: float) -> list[int]:
+    """Newest-first past rifts: the history, plus any that passed since the last archive run."""
+    recent = state.timeline.recent(now, LAST_RIFTS_SHOWN)
+    return sorted(set(state.archived) | set(recent), reverse=True)[:LAST_RIFTS_SHOWN]
+
+def _last_rift_reply(state: GuildState):
+    now = clock.time()
+    past = _past_rifts(state, now)
+    expires = state.timeline.next_after(now)  # the next rift becomes the last one
+    if not past:
+        return "No Rift has happened yet.", expires
+    lines = [f"📌 Last Rift: <t:{past[0]}:F> (<t:{past[0]}:R>)"]
+    if len(past) > 1:
+        lines.append("Before that: " + ", ".join(f"<t:{rift_ts}:f>" for rift_ts in past[1:]))
+    return "\n".join(lines), expires
+
+def _time_left_reply(state: GuildState):
+    now = clock.time()
+    rift_ts = state.timeline.next_after(now)
+    if rift_ts is None:
+        return "No upcoming Rift found.", None
+    total = int(rift_ts - now)
+    hours, remainder = divmod(total, 3600)
+    minutes = remainder // 60
+    # Rifts sit on whole minutes, so the text is stable until the next minute starts
+    return f"⏰ Time left until next Rift: **{hours}h {minutes}m**", min(rift_ts, (int(now) // 60 + 1) * 60)
+
 @tree.command(name="nextrift", description="Show the next Rift event")
 async def nextrift(interaction: discord.Interaction):
-    now = datetime.datetime.now(pytz.utc)
-    for rift_time_str in rifts:
-        rift_time = utc_parse(rift_time_str)
-        if rift_time > now:
-            await respond_safe(
-                interaction,
-                f"🌀 The next Rift is <t:{ts(rift_time)}:F>\n⏳ <t:{ts(rift_time)}:R>",
-                ephemeral=True
-            )
-            return
-    await respond_safe(interaction, "No upcoming Rift found.", ephemeral=True)
+    state = await guilds.get(interaction.guild_id)
+    reply = state.responses.get("nextrift", clock.time(), functools.partial(_next_rift_reply, state))
+    await respond_fast(interaction, reply, ephemeral=True)
 
 @tree.command(name="weeklyrifts", description="Show all Rifts in the next 7 days")
 async def weeklyrifts(interaction: discord.Interaction):
-    now = datetime.datetime.now(pytz.utc)
-    one_week = now + datetime.timedelta(days=7)
-    upcoming = []
-    for rift_time_str in rifts:
-        rift_time = utc_parse(rift_time_str)
-        if now <= rift_time <= one_week:
-            upcoming.append(f"<t:{ts(rift_time)}:F>")
-    if upcoming:
-        await respond_safe(interaction, "📅 Rifts this week:\n" + "\n".join(upcoming), ephemeral=True)
-    else:
-        await respond_safe(interaction, "No Rifts scheduled for the next 7 days.", ephemeral=True)
+    state = await guilds.get(interaction.guild_id)
+    reply = state.responses.get("weeklyrifts", clock.time(), functools.partial(_weekly_reply, state))
+    await respond_fast(interaction, reply, ephemeral=True)
 
-@tree.command(name="lastrift", description="Show the last Rift from the schedule")
+@tree.command(name="lastrift", description="Show the most recent Rifts")
 async def lastrift(interaction: discord.Interaction):
-    rift_time = utc_parse(rifts[-1])
-    await respond_safe(interaction, f"📌 Last Rift in the schedule:\n<t:{ts(rift_time)}:F>", ephemeral=True)
+    state = await guilds.get(interaction.guild_id)
+    reply = state.responses.get("lastrift", clock.time(), functools.partial(_last_rift_reply, state),
+                                state.archived)
+    await respond_fast(interaction, reply, ephemeral=True)
 
 @tree.command(name="timeleft", description="Show time left until next Rift")
 async def timeleft(interaction: discord.Interaction):
-    now = datetime.datetime.now(pytz.utc)
-    for rift_time_str in rifts:
-        rift_time = utc_parse(rift_time_str)
-        if rift_time > now:
-            delta = rift_time - now
-            total = int(delta.total_seconds())
-            hours, remainder = divmod(total, 3600)
-            minutes = remainder // 60
-            await respond_safe(interaction, f"⏰ Time left until next Rift: **{hours}h {minutes}m**", ephemeral=True)
-            return
-    await respond_safe(interaction, "No upcoming Rift found.", ephemeral=True)
+    state = await guilds.get(interaction.guild_id)
+    reply = state.responses.get("timeleft", clock.time(), functools.partial(_time_left_reply, state))
+    await respond_fast(interaction, reply, ephemeral=True)
 
 @tree.command(name="mytime", description="Show your local time and UTC")
 async def mytime(interaction: discord.Interaction):
     # Get current time using Discord's timestamp - it will show in user's local timezone
-    now_utc = datetime.datetime.now(pytz.utc)
+    now_utc = utcnow()
     now_ts = ts(now_utc)
     
     # Create message showing both times using Discord's timestamp formatting
-    await respond_safe(
+    await respond_fast(
         interaction,
         f"🕐 Current time: <t:{now_ts}:t> (your local)\n"
         f"🌍 UTC time: {now_utc.strftime('%H:%M')} UTC\n"
@@ -340,8 +847,7 @@ async def mytime(interaction: discord.Interaction):
         ephemeral=True
     )
 
-@tree.command(name="help", description="Show all commands and bot details")
-async def help_command(interaction: discord.Interaction):
+def _help_embed(state: GuildState):
     embed = discord.Embed(
         title="🤖 Umbral Rift Bot – your silent Rift assistant",
         description=(
@@ -354,148 +860,186 @@ async def help_command(interaction: discord.Interaction):
             "**📘 Commands:**\n"
             "`/nextrift` – Shows the next Rift (in your timezone)\n"
             "`/weeklyrifts` – Rifts in the next 7 days\n"
-            "`/lastrift` – Date & time of the last scheduled Rift\n"
+            "`/lastrift` – The most recent Rifts\n"
             "`/timeleft` – Countdown to the next Rift (e.g. '2h 7m')\n"
             "`/mytime` – Shows current time in your timezone and UTC\n"
+            "`/subscribe` – Get reminders by DM at the offsets you pick\n"
+            "`/unsubscribe` – Stop reminder DMs\n"
             "`/help` – Shows this help message\n\n"
             "**🔔 Want to be notified?**\n"
-            "Make sure you have the correct role to receive Rift reminders.\n"
-            "You can grab the role in <#1385418864330014771>."
+            "Make sure you have the correct role to receive Rift reminders."
+            + (f"\nYou can grab the role in <#{state.config.help_channel_id}>."
+               if state.config.help_channel_id else "")
         ),
         color=0x5865F2
     )
     embed.set_footer(text="Let the Rift chaos begin 🔥")
-    await respond_safe(interaction, embed=embed, ephemeral=True)
+    return embed, None
 
-@tree.command(name="uploadics", description="Upload a .ics file to add new Rift events")
-@app_commands.checks.has_any_role(R5_ROLE_ID, R4_ROLE_ID)
-async def uploadics(interaction: discord.Interaction, attachment: discord.Attachment):
+@tree.command(name="help", description="Show all commands and bot details")
+async def help_command(interaction: discord.Interaction):
+    state = await guilds.get(interaction.guild_id)
+    embed = state.responses.get("help", clock.time(), functools.partial(_help_embed, state))
+    await respond_fast(interaction, embed=embed, ephemeral=True)
+
+def _parse_offsets(text: str) -> list[int]:
+    """'60, 15' -> [3600, 900]; only the channel reminder offsets can be picked."""
+    deltas = set()
+    for part in text.replace(" ", ",").split(","):
+        if not part:
+            continue
+        if not part.removesuffix("min").isdigit() or int(part.removesuffix("min")) * 60 not in REMINDER_OFFSETS:
+            raise ValueError(part)
+        deltas.add(int(part.removesuffix("min")) * 60)
+    return sorted(deltas, reverse=True)
+
+@tree.command(name="subscribe", description="Get Rift reminders by DM")
+@app_commands.describe(offsets="Minutes before each Rift, e.g. '60, 15' (choices: 60, 30, 15, 5)")
+async def subscribe(interaction: discord.Interaction, offsets: str = "60, 15"):
+    choices = ", ".join(str(d // 60) for d in REMINDER_OFFSETS)
+    try:
+        deltas = _parse_offsets(offsets)
+    except ValueError as e:
+        await respond_fast(interaction, f"❌ `{e}` is not a reminder offset. Pick from: {choices}", ephemeral=True)
+        return
+    if not deltas:
+        await respond_fast(interaction, f"❌ Pick at least one offset from: {choices}", ephemeral=True)
+        return
+    # Defer first: the store write may queue behind others for longer than Discord waits
+    await interaction.response.defer(ephemeral=True)
+    state = await guilds.get(interaction.guild_id)
+    await store.subscribe(state.guild_id, interaction.user.id, deltas)
+    await respond_safe(
+        interaction,
+        f"✅ You'll get a DM {', '.join(f'{d // 60}min' for d in deltas)} before each Rift.\n"
+        "Make sure DMs from this server are allowed, or they will be paused.",
+        ephemeral=True
+    )
+
+@tree.command(name="unsubscribe", description="Stop Rift reminder DMs")
+async def unsubscribe(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+    state = await guilds.get(interaction.guild_id)
+    had = await store.subscription(state.guild_id, interaction.user.id)
+    await store.subscribe(state.guild_id, interaction.user.id, [])
+    await respond_safe(interaction, "🔕 Reminder DMs stopped." if had else "You weren't subscribed.", ephemeral=True)
+
+async def _read_ics(interaction: discord.Interaction, attachment: discord.Attachment):
+    """Check, defer, download and parse an uploaded .ics: (found, rejected, truncated),
+    or None once the user has been told why the file can't be used."""
     if not attachment.filename.endswith(".ics"):
         await respond_safe(interaction, "Please upload a valid .ics file.", ephemeral=True)
-        return
+        return None
+    if attachment.size > ics_import.ICS_MAX_BYTES:
+        await respond_safe(interaction, f"❌ File too large (max {ics_import.ICS_MAX_BYTES // 1000} kB).", ephemeral=True)
+        return None
 
+    await interaction.response.defer(ephemeral=True)
     content = await attachment.read()
     try:
-        cal = Calendar.from_ical(content)
-        new_rifts = []
-        for component in cal.walk():
-            if component.name == "VEVENT":
-                dtstart = component.get("dtstart").dt
-                if isinstance(dtstart, datetime.datetime):
-                    dtstart_utc = dtstart.astimezone(pytz.utc)
-                    new_rifts.append(dtstart_utc.strftime("%Y-%m-%d %H:%M"))
-
-        if new_rifts:
-            global rifts
-            old_count = len(rifts)
-            rifts_set = set(rifts)
-            rifts_set.update(new_rifts)
-            rifts = sorted(rifts_set)
-            save_rifts()
-
-            await respond_safe(
-                interaction,
-                f"✅ Rift schedule updated. Added {len(rifts) - old_count} new events (now total {len(rifts)}).",
-                ephemeral=True
-            )
-
-            channel = await get_text_channel(1398208622567227462)
-            if channel:
-                update_message = (
-                    f"📢 **Rift schedule updated!**\n"
-                    f"Uploaded by: {interaction.user.mention}\n"
-                    f"Total events: **{len(rifts)}**\n"
-                    f"Use `/weeklyrifts` or `/nextrift` to view the updated schedule."
-                )
-                await send_safe_message(channel, f"<@&{R5_ROLE_ID}> <@&{R4_ROLE_ID}>\n{update_message}")
-        else:
-            await respond_safe(interaction, "No valid Rift dates found in the file.", ephemeral=True)
+        # Parsing + RRULE expansion is CPU-bound and unbounded: a killable child process
+        return await ics_import.parse_ics_isolated(content, utcnow())
+    except ics_import.IcsRejected as e:
+        await respond_safe(interaction, f"❌ Rejected .ics file: {e}", ephemeral=True)
     except Exception as e:
         await respond_safe(interaction, f"❌ Failed to parse .ics file: {e}", ephemeral=True)
+    return None
+
+@tree.command(name="uploadics", description="Upload a .ics file to add new Rift events")
+@schedule_owner()
+@editor_only()
+async def uploadics(interaction: discord.Interaction, attachment: discord.Attachment):
+    parsed = await _read_ics(interaction, attachment)
+    if parsed is None:
+        return
+    found, rejected, truncated = parsed
+    state = await guilds.get(interaction.guild_id)
+
+    result = ics_import.diff(found, rejected, truncated, lambda r: state.schedule.contains(parse_epoch(r)))
+    if not result.added:
+        reasons = "".join(f"\n• {name}: {why}" for name, why in result.rejected[:5])
+        await respond_safe(interaction, f"No new Rift dates found in the file.\n{result.summary()}{reasons}", ephemeral=True)
+        return
+
+    snapshot = state.schedule.snapshot()
+    state.schedule.add(parse_epoch(r) for r in result.added)
+    added, _ = await apply_schedule_change(state, undo=(f"upload of {attachment.filename}", snapshot))
+
+    await respond_safe(
+        interaction,
+        f"✅ Rift schedule updated.\n{result.summary()}\n"
+        f"🔔 {added} new reminders scheduled",
+        ephemeral=True
+    )
+
+    config = state.config
+    channel = await get_text_channel(config.announce_channel_id) if config.announce_channel_id else None
+    if channel:
+        update_message = (
+            f"📢 **Rift schedule updated!**\n"
+            f"Uploaded by: {interaction.user.mention}\n"
+            f"New events: **{len(result.added)}**\n"
+            f"Use `/weeklyrifts` or `/nextrift` to view the updated schedule."
+        )
+        pings = " ".join(f"<@&{role_id}>" for role_id in config.editor_roles)
+        await send_safe_message(channel, f"{pings}\n{update_message}")
 
 @uploadics.error
 async def uploadics_error(interaction: discord.Interaction, error):
-    if isinstance(error, app_commands.errors.MissingAnyRole):
-        await respond_safe(interaction, "You don't have permission to use this command.", ephemeral=True)
-    else:
+    if not await _check_failed(interaction, error):
         await respond_safe(interaction, "An error occurred while processing the file.", ephemeral=True)
 
 @tree.command(name="delay_next_rift", description="Shift the next Rift forward/backward by minutes")
 @app_commands.describe(minutes="Positive = delay, negative = earlier")
-@app_commands.checks.has_any_role(R5_ROLE_ID, R4_ROLE_ID)
+@schedule_owner()
+@editor_only()
 async def delay_next_rift(interaction: discord.Interaction, minutes: int):
-    now = datetime.datetime.now(pytz.utc)
+    now = utcnow()
+    if abs(minutes) > MAX_BULK_DAYS * 1440:
+        await respond_safe(interaction, f"❌ A Rift can be moved by at most {MAX_BULK_DAYS} days.", ephemeral=True)
+        return
+    state = await guilds.get(interaction.guild_id)
     
     # Find the next rift
-    next_rift_index = None
-    next_rift_time = None
-    for i, rift_time_str in enumerate(rifts):
-        rift_time = utc_parse(rift_time_str)
-        if rift_time > now:
-            next_rift_index = i
-            next_rift_time = rift_time
-            break
-    
-    if next_rift_index is None:
+    next_ts = state.timeline.next_after(now.timestamp())
+    if next_ts is None:
         await respond_safe(interaction, "No upcoming Rift found.", ephemeral=True)
         return
     
-    old_rift_str = rifts[next_rift_index]
-    
-    # Cancel old tasks for this specific rift
-    if old_rift_str in scheduled_tasks:
-        for task in scheduled_tasks[old_rift_str]:
-            if not task.cancelled():
-                task.cancel()
-        # Remove from scheduled_tasks
-        del scheduled_tasks[old_rift_str]
-        print(f"Cancelled tasks for {old_rift_str}")
+    old_rift_str = fmt_epoch(next_ts)
+    next_rift_time = utc_parse(old_rift_str)
     
     # Calculate new time
     new_time = next_rift_time + datetime.timedelta(minutes=minutes)
     new_rift_str = new_time.strftime("%Y-%m-%d %H:%M")
     
     # Check if new time conflicts with existing rifts
-    if new_rift_str in rifts and new_rift_str != old_rift_str:
+    if state.schedule.contains(ts(new_time)) and new_rift_str != old_rift_str:
         await respond_safe(
             interaction,
             f"⚠️ Cannot delay - conflicts with existing Rift at <t:{ts(new_time)}:F>",
             ephemeral=True
         )
-        # Reschedule the original rift since we cancelled its tasks
-        original_time = utc_parse(old_rift_str)
-        tasks = []
-        for delta in [3600, 1800, 900, 300]:
-            remind_time = original_time - datetime.timedelta(seconds=delta)
-            if remind_time > now:
-                t = asyncio.create_task(schedule_reminder(remind_time, original_time, delta))
-                tasks.append(t)
-        if tasks:
-            scheduled_tasks[old_rift_str] = tasks
         return
     
-    # Update the rift time in the list
-    rifts[next_rift_index] = new_rift_str
-    save_rifts()
-    
-    # Schedule new reminders for the delayed rift
-    tasks = []
-    for delta in [3600, 1800, 900, 300]:
-        remind_time = new_time - datetime.timedelta(seconds=delta)
-        if remind_time > now:
-            try:
-                t = asyncio.create_task(schedule_reminder(remind_time, new_time, delta))
-                tasks.append(t)
-            except Exception as e:
-                print(f"Error scheduling reminder for {new_rift_str}, delta {delta}: {e}")
+    # Move it (a rule occurrence becomes an exception + explicit date), then
+    # swap the reminders of the old rift for the delayed one
+    snapshot = state.schedule.snapshot()
+    if not state.schedule.move(next_ts, ts(new_time)):
+        # The timeline lagged behind the schedule (e.g. an edit still being applied)
+        log.warning("rift to delay is no longer scheduled", extra={"guild": state.guild_id, "rift": old_rift_str})
+        await respond_safe(interaction, f"⚠️ The Rift at <t:{next_ts}:F> is no longer scheduled; nothing was moved.",
+                           ephemeral=True)
+        return
+    await apply_schedule_change(state, now, undo=(f"delay of {old_rift_str} by {minutes:+} min", snapshot))
+    scheduled = len(scheduler.pending((state.guild_id, new_rift_str)))
     
-    if tasks:
-        scheduled_tasks[new_rift_str] = tasks
-        print(f"Scheduled {len(tasks)} new tasks for {new_rift_str}")
+    if scheduled:
+        log.info("⏱️ rift delayed", extra={"guild": state.guild_id, "rift": new_rift_str, "count": scheduled})
         await respond_safe(
             interaction,
             f"✅ Rift moved from <t:{ts(next_rift_time)}:F> to <t:{ts(new_time)}:F> ({minutes:+} min)\n"
-            f"🔔 {len(tasks)} reminders scheduled",
+            f"🔔 {scheduled} reminders scheduled",
             ephemeral=False
         )
     else:
@@ -507,68 +1051,336 @@ async def delay_next_rift(interaction: discord.Interaction, minutes: int):
 
 @delay_next_rift.error
 async def delay_next_rift_error(interaction: discord.Interaction, error):
-    if isinstance(error, app_commands.errors.MissingAnyRole):
-        await respond_safe(interaction, "You don't have permission to use this command.", ephemeral=True)
-    else:
-        print(f"Error in delay_next_rift: {error}")
+    if not await _check_failed(interaction, error):
+        log.error("command failed", exc_info=error, extra={"route": "delay_next_rift"})
         await respond_safe(interaction, "An error occurred while trying to delay the Rift.", ephemeral=True)
 
+@tree.command(name="set_rift_rule", description="Replace the recurring Rift rule (admin only)")
+@app_commands.describe(
+    start="First rift, 'YYYY-MM-DD HH:MM' UTC",
+    every_days="Days between rifts",
+    times="Comma-separated UTC times cycled through, e.g. '08:00,20:00'",
+    until="Optional last date, 'YYYY-MM-DD HH:MM' UTC"
+)
+@schedule_owner()
+@editor_only()
+async def set_rift_rule(interaction: discord.Interaction, start: str, every_days: int = 2,
+                        times: str = "08:00,20:00", until: str | None = None):
+    try:
+        parse_epoch(start)
+        if until:
+            parse_epoch(until)
+        rule = RiftRule(start, every_days, [t.strip() for t in times.split(",") if t.strip()], until)
+    except ValueError as e:
+        await respond_safe(interaction, f"❌ Invalid rule: {e}", ephemeral=True)
+        return
+    state = await guilds.get(interaction.guild_id)
+    snapshot = state.schedule.snapshot()
+    state.schedule.set_rules([rule])
+    added, cancelled = await apply_schedule_change(state, undo=("rule change", snapshot))
+    await respond_safe(
+        interaction,
+        f"✅ Rift rule set: {rule.describe()}\n🔔 +{added} / -{cancelled} reminders",
+        ephemeral=True
+    )
+
+@set_rift_rule.error
+async def set_rift_rule_error(interaction: discord.Interaction, error):
+    if not await _check_failed(interaction, error):
+        log.error("command failed", exc_info=error, extra={"route": "set_rift_rule"})
+        await respond_safe(interaction, "An error occurred while setting the Rift rule.", ephemeral=True)
+
+@tree.command(name="clear_rift_rules", description="Remove recurring Rift rules, keep uploaded dates (admin only)")
+@schedule_owner()
+@editor_only()
+async def clear_rift_rules(interaction: discord.Interaction):
+    state = await guilds.get(interaction.guild_id)
+    snapshot = state.schedule.snapshot()
+    state.schedule.set_rules([])
+    added, cancelled = await apply_schedule_change(state, undo=("clearing the rules", snapshot))
+    await respond_safe(interaction, f"🧹 Rift rules cleared.\n🔔 +{added} / -{cancelled} reminders", ephemeral=True)
+
+@clear_rift_rules.error
+async def clear_rift_rules_error(interaction: discord.Interaction, error):
+    if not await _check_failed(interaction, error):
+        log.error("command failed", exc_info=error, extra={"route": "clear_rift_rules"})
+        await respond_safe(interaction, "An error occurred while clearing the Rift rules.", ephemeral=True)
+
+def _parse_range(start: str, end: str) -> tuple[int, int]:
+    """Inclusive UTC range from 'YYYY-MM-DD[ HH:MM]' bounds; a bare end date covers that whole day."""
+    start, end = start.strip(), end.strip()
+    lo = parse_epoch(start if len(start) > 10 else f"{start} 00:00")
+    hi = parse_epoch(end if len(end) > 10 else f"{end} 23:59")
+    if hi < lo:
+        raise ValueError("the range ends before it starts")
+    if hi - lo > MAX_BULK_DAYS * 86400:
+        raise ValueError(f"ranges are limited to {MAX_BULK_DAYS} days")
+    return lo, hi
+
+def _rift_list(epochs, limit: int = 10) -> str:
+    lines = [f"• <t:{epoch}:F>" for epoch in list(epochs)[:limit]]
+    if len(epochs) > limit:
+        lines.append(f"… and {len(epochs) - limit} more")
+    return "\n".join(lines)
+
+async def _bulk_edit_error(interaction: discord.Interaction, error, action: str):
+    if not await _check_failed(interaction, error):
+        log.error("command failed", exc_info=error,
+                  extra={"route": interaction.command.name if interaction.command else action})
+        await respond_safe(interaction, f"An error occurred while trying to {action}.", ephemeral=True)
+
+@tree.command(name="shift_rifts", description="Shift every Rift in a date range by minutes")
+@app_commands.describe(
+    start="From 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM' UTC",
+    end="Until 'YYYY-MM-DD' (whole day) or 'YYYY-MM-DD HH:MM' UTC",
+    minutes="Positive = delay, negative = earlier"
+)
+@schedule_owner()
+@editor_only()
+async def shift_rifts(interaction: discord.Interaction, start: str, end: str, minutes: int):
+    try:
+        lo, hi = _parse_range(start, end)
+    except ValueError as e:
+        await respond_safe(interaction, f"❌ Invalid range: {e}", ephemeral=True)
+        return
+    seconds = minutes * 60
+    if abs(seconds) > MAX_BULK_DAYS * 86400 or lo + seconds < EPOCH_MIN or hi + seconds > EPOCH_MAX:
+        await respond_safe(interaction, f"❌ Rifts can be shifted by at most {MAX_BULK_DAYS} days "
+                                        "and must stay between the years 2000 and 9999.", ephemeral=True)
+        return
+    state = await guilds.get(interaction.guild_id)
+    snapshot = state.schedule.snapshot()
+    try:
+        moved = state.schedule.shift(lo, hi, seconds)
+    except ValueError as e:
+        await respond_safe(interaction, f"⚠️ Cannot shift - a Rift would land on the existing one at {e} UTC",
+                           ephemeral=True)
+        return
+    if not moved:
+        await respond_safe(interaction, "No Rifts in that range.", ephemeral=True)
+        return
+    added, cancelled = await apply_schedule_change(
+        state, undo=(f"shift of {len(moved)} rifts by {minutes:+} min", snapshot))
+    await respond_safe(
+        interaction,
+        f"✅ Shifted {len(moved)} Rifts by {minutes:+} min\n{_rift_list([new for _, new in moved])}\n"
+        f"🔔 +{added} / -{cancelled} reminders",
+        ephemeral=False
+    )
+
+@shift_rifts.error
+async def shift_rifts_error(interaction: discord.Interaction, error):
+    await _bulk_edit_error(interaction, error, "shift the Rifts")
+
+@tree.command(name="delete_rifts", description="Delete every Rift in a date range")
+@app_commands.describe(
+    start="From 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM' UTC",
+    end="Until 'YYYY-MM-DD' (whole day) or 'YYYY-MM-DD HH:MM' UTC"
+)
+@schedule_owner()
+@editor_only()
+async def delete_rifts(interaction: discord.Interaction, start: str, end: str):
+    try:
+        lo, hi = _parse_range(start, end)
+    except ValueError as e:
+        await respond_safe(interaction, f"❌ Invalid range: {e}", ephemeral=True)
+        return
+    state = await guilds.get(interaction.guild_id)
+    snapshot = state.schedule.snapshot()
+    removed = state.schedule.remove_range(lo, hi)
+    if not removed:
+        await respond_safe(interaction, "No Rifts in that range.", ephemeral=True)
+        return
+    _, cancelled = await apply_schedule_change(state, undo=(f"deletion of {len(removed)} rifts", snapshot))
+    await respond_safe(
+        interaction,
+        f"🗑️ Deleted {len(removed)} Rifts\n{_rift_list(removed)}\n🔕 {cancelled} reminders cancelled\n"
+        "Use `/undo_edit` to bring them back.",
+        ephemeral=False
+    )
+
+@delete_rifts.error
+async def delete_rifts_error(interaction: discord.Interaction, error):
+    await _bulk_edit_error(interaction, error, "delete the Rifts")
+
+@tree.command(name="replace_rifts", description="Replace every Rift in a date range with the events of a .ics file")
+@app_commands.describe(
+    attachment="The .ics file",
+    start="From 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM' UTC",
+    end="Until 'YYYY-MM-DD' (whole day) or 'YYYY-MM-DD HH:MM' UTC"
+)
+@schedule_owner()
+@editor_only()
+async def replace_rifts(interaction: discord.Interaction, attachment: discord.Attachment, start: str, end: str):
+    try:
+        lo, hi = _parse_range(start, end)
+    except ValueError as e:
+        await respond_safe(interaction, f"❌ Invalid range: {e}", ephemeral=True)
+        return
+    parsed = await _read_ics(interaction, attachment)
+    if parsed is None:
+        return
+    found, rejected, _ = parsed
+    state = await guilds.get(interaction.guild_id)
+
+    snapshot = state.schedule.snapshot()
+    added, removed = state.schedule.replace_window(lo, hi, (parse_epoch(r) for r in found))
+    if not added and not removed:
+        await respond_safe(interaction, "The file matches the current schedule for that range; nothing changed.",
+                           ephemeral=True)
+        return
+    reminders_added, cancelled = await apply_schedule_change(
+        state, undo=(f"replacement from {attachment.filename}", snapshot))
+    outside = sum(1 for r in found if not lo <= parse_epoch(r) <= hi)
+    await respond_safe(
+        interaction,
+        f"✅ Replaced Rifts from <t:{lo}:f> to <t:{hi}:f>\n➕ {len(added)} added · ➖ {len(removed)} removed"
+        + (f" · ⏭️ {outside} outside the range ignored" if outside else "")
+        + (f" · ⛔ {len(rejected)} rejected" if rejected else "")
+        + f"\n🔔 +{reminders_added} / -{cancelled} reminders",
+        ephemeral=True
+    )
+
+@replace_rifts.error
+async def replace_rifts_error(interaction: discord.Interaction, error):
+    await _bulk_edit_error(interaction, error, "process the file")
+
+@tree.command(name="undo_edit", description="Undo the last schedule edit (admin only)")
+@schedule_owner()
+@editor_only()
+async def undo_edit(interaction: discord.Interaction):
+    state = await guilds.get(interaction.guild_id)
+    if not state.history:
+        await respond_safe(interaction, "Nothing to undo.", ephemeral=True)
+        return
+    label, snapshot = state.history.pop()
+    state.schedule.restore(snapshot)
+    added, cancelled = await apply_schedule_change(state)
+    await respond_safe(
+        interaction,
+        f"↩️ Undid the {label}\n🔔 +{added} / -{cancelled} reminders"
+        + (f"\n{len(state.history)} earlier edit(s) can still be undone" if state.history else ""),
+        ephemeral=False
+    )
+
+@undo_edit.error
+async def undo_edit_error(interaction: discord.Interaction, error):
+    await _bulk_edit_error(interaction, error, "undo the edit")
+
 @tree.command(name="debug_tasks", description="Show scheduled task status (admin only)")
-@app_commands.checks.has_any_role(R5_ROLE_ID, R4_ROLE_ID)
+@editor_only()
 async def debug_tasks(interaction: discord.Interaction):
-    now = datetime.datetime.now(pytz.utc)
+    await interaction.response.defer(ephemeral=True)  # the history and subscriber counts come from the store
+    now = clock.time()
+    state = await guilds.get(interaction.guild_id)
     
     # Find next rift
-    next_rift = None
-    for rift_time_str in rifts:
-        rift_time = utc_parse(rift_time_str)
-        if rift_time > now:
-            next_rift = rift_time_str
-            break
+    next_ts = state.timeline.next_after(now)
+    next_rift = fmt_epoch(next_ts) if next_ts is not None else None
     
     embed = discord.Embed(title="🔧 Task Debug Info", color=0x5865F2)
     
     # Show next rift
     if next_rift:
-        next_time = utc_parse(next_rift)
         embed.add_field(
             name="Next Rift", 
-            value=f"<t:{ts(next_time)}:F>\n<t:{ts(next_time)}:R>", 
+            value=f"<t:{next_ts}:F>\n<t:{next_ts}:R>", 
             inline=False
         )
         
-        # Show scheduled tasks for next rift
-        if next_rift in scheduled_tasks:
-            tasks = scheduled_tasks[next_rift]
-            active_tasks = [t for t in tasks if not t.cancelled()]
-            cancelled_tasks = [t for t in tasks if t.cancelled()]
-            
+        # Show pending reminders for next rift
+        pending = scheduler.pending((state.guild_id, next_rift))
+        if pending:
+            offsets = ", ".join(f"{d // 60}min" for d in pending)
             embed.add_field(
                 name="Scheduled Reminders", 
-                value=f"✅ Active: {len(active_tasks)}\n❌ Cancelled: {len(cancelled_tasks)}", 
+                value=f"✅ Pending: {len(pending)} ({offsets})", 
                 inline=True
             )
         else:
-            embed.add_field(name="Scheduled Reminders", value="⚠️ No tasks found!", inline=True)
+            embed.add_field(name="Scheduled Reminders", value="⚠️ No reminders found!", inline=True)
     else:
         embed.add_field(name="Next Rift", value="None found", inline=False)
     
-    # Show total scheduled rifts
-    total_scheduled = len(scheduled_tasks)
-    embed.add_field(name="Total Rifts with Tasks", value=str(total_scheduled), inline=True)
+    # Show dispatcher state
+    next_fire = scheduler.next_fire()
+    embed.add_field(name="Total Rifts with Reminders", value=str(scheduler.rift_count()), inline=True)
+    embed.add_field(
+        name="Dispatcher",
+        value=(f"{'🟢 running' if scheduler.is_alive() else '🔴 stopped'}\n"
+               f"Pending: {len(scheduler)} · In flight: {scheduler.inflight_count()}\n"
+               f"Coalesced: {coalescer.merged} into {coalescer.messages} msgs ({COALESCE_SECONDS}s window)\n"
+               f"Guilds: {len(guilds)} loaded · {len(guilds.configs)} configured"
+               + (f"\nNext fire: <t:{int(next_fire)}:R>" if next_fire else "")),
+        inline=True
+    )
+    
+    # Show which shards this process serves
+    embed.add_field(
+        name="Process",
+        value=(f"`{LEDGER_OWNER}`\n"
+               f"Shards: {', '.join(map(str, SHARD_IDS)) if SHARD_IDS else 'all'} of {client.shard_count or 1}"),
+        inline=True
+    )
     
-    # Show recent rifts (last 3 that have passed)
-    recent_rifts = []
-    for rift_time_str in reversed(rifts):
-        rift_time = utc_parse(rift_time_str)
-        if rift_time <= now:
-            recent_rifts.append(f"<t:{ts(rift_time)}:R>")
-            if len(recent_rifts) >= 3:
-                break
+    # Show recent rifts (last 3 that have passed) and monthly history
+    recent_rifts = [f"<t:{rift_ts}:R>" for rift_ts in _past_rifts(state, now)]
     
     if recent_rifts:
         embed.add_field(name="Recent Past Rifts", value="\n".join(recent_rifts), inline=False)
     
+    months = await store.monthly_stats(state.guild_id, 3)
+    if months:
+        lines = [f"{month}: {rifts} rifts ({explicit} one-off) · {reminders} reminders sent"
+                 for month, rifts, explicit, reminders in months]
+        embed.add_field(name="History", value="\n".join(lines), inline=False)
+    
+    # Show schedule model
+    rules = "\n".join(f"🔁 {rule.describe()}" for rule in state.schedule.rules) or "No recurring rule"
+    embed.add_field(
+        name=f"Schedule (guild {state.guild_id or 'default'})",
+        value=f"{rules}\n📌 Explicit dates: {state.schedule.explicit_count()}\n🪟 Materialized window: {len(state.timeline)} rifts",
+        inline=False
+    )
+    
+    # Show how close to the second recent reminders landed
+    if recent_lateness:
+        lines = [f"{rift} {delta // 60}min: {late * 1000:+.0f}ms" for rift, delta, late in list(recent_lateness)[-5:]]
+        embed.add_field(name="Reminder Lateness", value="\n".join(lines), inline=False)
+    
+    # Show send lanes
+    embed.add_field(
+        name="Send Lanes",
+        value="\n".join(f"**{lane.name}**: {lane.summary()}" for lane in (FAST_Q, SEND_Q, DM_Q)),
+        inline=False
+    )
+    
+    # Show DM subscriptions and recent fan-outs
+    lines = [f"👥 {await store.subscriber_count(state.guild_id)} subscribers in this guild"]
+    lines += [f"📨 {fanout.summary()}" for fanout in recent_fanouts]
+    embed.add_field(name="Reminder DMs", value="\n".join(lines), inline=False)
+    
+    # Show response cache
+    cache_stats = state.responses.stats()
+    if cache_stats:
+        embed.add_field(
+            name=f"Response Cache (v{state.responses.version})",
+            value="\n".join(f"`/{name}` {hit} hit / {miss} miss" for name, (hit, miss) in cache_stats.items()),
+            inline=False
+        )
+    
+    # Show the worst event-loop stalls
+    if watchdog.stalls:
+        lines = [f"<t:{int(stall.started)}:R> **{stall.duration:.2f}s** `{stall.where}`\n↳ {stall.task[:80]}"
+                 for stall in watchdog.top(5)]
+        embed.add_field(name=f"Loop Stalls ({watchdog.stalls} over {WATCHDOG_STALL_MS}ms)",
+                        value="\n".join(lines), inline=False)
+    
+    # Show permanently failed sends
+    if dead_letters:
+        lines = [f"<t:{at}:R> `{route}` {reason[:60]}" for at, route, reason, _ in list(dead_letters)[-5:]]
+        embed.add_field(name=f"Dead Letters ({len(dead_letters)})", value="\n".join(lines), inline=False)
+    
     await respond_safe(interaction, embed=embed, ephemeral=True)
 
 @debug_tasks.error
@@ -576,6 +1388,44 @@ async def debug_tasks_error(interaction: discord.Interaction, error):
     if isinstance(error, app_commands.errors.MissingAnyRole):
         await respond_safe(interaction, "You don't have permission to use this command.", ephemeral=True)
 
+@tree.command(name="setup_rifts", description="Give this server its own Rift schedule and reminder channel (admin only)")
+@app_commands.describe(
+    channel="Channel for Rift reminders",
+    role="Role pinged by reminders",
+    editor_role="Role allowed to edit the schedule",
+    second_editor_role="Another role allowed to edit the schedule",
+    announce_channel="Channel for schedule-update announcements",
+    help_channel="Channel where members grab the reminder role"
+)
+@app_commands.guild_only()
+@app_commands.checks.has_permissions(manage_guild=True)
+async def setup_rifts(interaction: discord.Interaction, channel: discord.TextChannel, role: discord.Role,
+                      editor_role: discord.Role, second_editor_role: discord.Role | None = None,
+                      announce_channel: discord.TextChannel | None = None,
+                      help_channel: discord.TextChannel | None = None):
+    first_setup = interaction.guild_id not in guilds.configs
+    editors = [editor_role.id] + ([second_editor_role.id] if second_editor_role else [])
+    state = await guilds.configure(GuildConfig(
+        interaction.guild_id, channel.id, role.id, editors,
+        announce_channel.id if announce_channel else None, help_channel.id if help_channel else None))
+    state.responses.invalidate()  # /help mentions the configured channels
+    pending = sum(len(scheduler.pending(key)) for key in scheduler.rifts() if key[0] == state.guild_id)
+    await respond_safe(
+        interaction,
+        ("✅ This server now has its own Rift schedule (default rule)." if first_setup
+         else "✅ Rift settings updated.")
+        + f"\n📣 Reminders go to {channel.mention} pinging {role.mention}\n🔔 {pending} reminders pending",
+        ephemeral=True
+    )
+
+@setup_rifts.error
+async def setup_rifts_error(interaction: discord.Interaction, error):
+    if isinstance(error, app_commands.errors.MissingPermissions):
+        await respond_safe(interaction, "You need the Manage Server permission to use this command.", ephemeral=True)
+    else:
+        log.error("command failed", exc_info=error, extra={"route": "setup_rifts"})
+        await respond_safe(interaction, "An error occurred while saving the Rift settings.", ephemeral=True)
+
 # --- start ---
-keep_alive()      # lightweight endpoint /health and /
-client.run(TOKEN) # NO while True - discord.py reconnects automatically
+if __name__ == "__main__":
+    client.run(TOKEN, log_handler=log_handler) # NO while True - discord.py reconnects automatically
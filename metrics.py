@@ -0,0 +1,151 @@
+# metrics.py
+import time
+import asyncio
+from bisect import bisect_left
+
+# Latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LATENESS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names, values, extra=()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels=()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            out.append(f"{self.name}{_fmt_labels(self.labels, labels)} {value}")
+        return out
+
+
+class Gauge:
+    """Value read from a callback at scrape time (no cost on the hot path)."""
+
+    def __init__(self, name: str, doc: str, fn, labels=()):
+        self.name, self.doc, self.labels, self.fn = name, doc, tuple(labels), fn
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge"]
+        values = self.fn()
+        if not self.labels:
+            values = {(): values}
+        for labels, value in values.items():
+            out.append(f"{self.name}{_fmt_labels(self.labels, labels)} {value}")
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, buckets=LATENCY_BUCKETS, labels=()):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self._series.items()):
+            series = list(series)
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                running += count
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, labels, [('le', bound)])} {running}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, labels)} {series[-1]}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, labels)} {running}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:  # a broken gauge must not take the endpoint down
+                lines.append(f"# {metric.name} unavailable: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+send_latency = REGISTRY.register(Histogram(
+    "rift_send_seconds", "Time spent in the Discord send call", labels=("route",)))
+send_429 = REGISTRY.register(Counter(
+    "rift_send_429_total", "Rate-limited (429) send attempts", labels=("route",)))
+send_failed = REGISTRY.register(Counter(
+    "rift_send_dead_letter_total", "Sends dropped after retries", labels=("route",)))
+reminder_lateness = REGISTRY.register(Histogram(
+    "rift_reminder_lateness_seconds", "Actual send time minus remind_time",
+    buckets=LATENESS_BUCKETS, labels=("offset",)))
+reminder_batch_size = REGISTRY.register(Histogram(
+    "rift_reminder_batch_size", "Reminders per posted reminder message", buckets=(1, 2, 3, 4, 6, 8, 12)))
+reminders_coalesced = REGISTRY.register(Counter(
+    "rift_reminders_coalesced_total", "Reminders merged into another reminder's message"))
+reminders_caught_up = REGISTRY.register(Counter(
+    "rift_reminders_caught_up_total", "Missed reminders sent late after a restart or reconnect"))
+dm_sent = REGISTRY.register(Counter(
+    "rift_dm_total", "Reminder DMs by outcome (sent / closed / failed)", labels=("result",)))
+dm_fanout_rate = REGISTRY.register(Histogram(
+    "rift_dm_fanout_per_second", "DMs delivered per second over one reminder's fan-out",
+    buckets=(1, 5, 10, 25, 50, 100, 250)))
+feed_requests = REGISTRY.register(Counter(
+    "rift_feed_requests_total", "Schedule feed requests by format and status", labels=("feed", "status")))
+command_latency = REGISTRY.register(Histogram(
+    "rift_command_seconds", "Slash command latency from invocation to reply", labels=("command",)))
+loop_lag = REGISTRY.register(Histogram(
+    "rift_event_loop_lag_seconds", "Event-loop scheduling lag", buckets=LATENCY_BUCKETS))
+loop_stalls = REGISTRY.register(Counter(
+    "rift_event_loop_stalls_total", "Event-loop stalls longer than the watchdog threshold"))
+_last_lag = [0.0]
+REGISTRY.register(Gauge("rift_event_loop_lag_last_seconds", "Most recent event-loop lag sample",
+                        lambda: _last_lag[0]))
+
+
+def route_label(route: str) -> str:
+    """Keep label cardinality bounded: per-channel routes stay, per-interaction ones collapse."""
+    return route if route.startswith("channel:") else route.split(":", 1)[0]
+
+
+def last_loop_lag() -> float:
+    return _last_lag[0]
+
+
+async def monitor_loop_lag(interval: float = 1.0):
+    """Sample how late the loop wakes us up compared to the requested sleep."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - start - interval)
+        _last_lag[0] = lag
+        loop_lag.observe(lag)
@@ -0,0 +1,130 @@
+# ratelimit.py
+import json
+import time
+import random
+import asyncio
+
+
+class TokenBucket:
+    """`capacity` sends per `per` seconds, refilled continuously."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, capacity: float, per: float):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def take(self, now: float) -> float:
+        """Consume a token; returns how long to wait before using it."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def idle(self, now: float) -> bool:
+        """Refilled and not blocked: indistinguishable from a fresh bucket."""
+        return (now >= self.blocked_until
+                and self.tokens + (now - self.updated) * self.rate >= self.capacity)
+
+    def block(self, now: float, seconds: float):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = min(self.tokens, 0)
+
+    def sync(self, now: float, remaining: int, reset_after: float):
+        """Align with Discord's X-RateLimit-Remaining / Reset-After."""
+        self.tokens = min(self.tokens, remaining)
+        self.updated = now
+        if remaining <= 0:
+            self.block(now, reset_after)
+
+
+class RouteLimiter:
+    """Per-route token buckets plus the shared global bucket.
+
+    Most routes are single-use (one per interaction followup or DM), so
+    idle buckets are dropped every `prune_every` seconds; a route that comes
+    back just gets a fresh, equally full bucket.
+    """
+
+    def __init__(self, route_capacity=5, route_per=5.0, global_capacity=50, global_per=1.0,
+                 prune_every: float = 60.0):
+        self._route_args = (route_capacity, route_per)
+        self._routes: dict[str, TokenBucket] = {}
+        self._global = TokenBucket(global_capacity, global_per)
+        self.prune_every = prune_every
+        self._pruned_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._routes)
+
+    def prune(self, now: float) -> int:
+        idle = [route for route, b in self._routes.items() if b.idle(now)]
+        for route in idle:
+            del self._routes[route]
+        self._pruned_at = now
+        return len(idle)
+
+    def bucket(self, route: str) -> TokenBucket:
+        b = self._routes.get(route)
+        if b is None:
+            b = self._routes[route] = TokenBucket(*self._route_args)
+        return b
+
+    async def acquire(self, route: str):
+        now = time.monotonic()
+        if now - self._pruned_at >= self.prune_every:
+            self.prune(now)
+        wait = max(self.bucket(route).take(now), self._global.take(now))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def rate_limited(self, route: str, retry_after: float, is_global=False):
+        now = time.monotonic()
+        (self._global if is_global else self.bucket(route)).block(now, retry_after)
+
+    def observe(self, route: str, headers):
+        """Feed rate-limit headers from a response (if any) into the route bucket."""
+        if not headers:
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is None or reset_after is None:
+            return
+        try:
+            self.bucket(route).sync(time.monotonic(), int(remaining), float(reset_after))
+        except ValueError:
+            pass
+
+
+def rate_limit_info(exc) -> tuple[float | None, bool, object]:
+    """(retry_after, is_global, headers) from a discord.HTTPException / RateLimited."""
+    retry_after = getattr(exc, "retry_after", None)
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    is_global = False
+    if headers:
+        is_global = str(headers.get("X-RateLimit-Global", "")).lower() == "true"
+        if retry_after is None:
+            value = headers.get("Retry-After") or headers.get("X-RateLimit-Reset-After")
+            if value is not None:
+                try:
+                    retry_after = float(value)
+                except ValueError:
+                    pass
+    if retry_after is None and isinstance(getattr(exc, "text", None), str):
+        try:
+            body = json.loads(exc.text)
+            retry_after = float(body.get("retry_after"))
+            is_global = is_global or bool(body.get("global"))
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return retry_after, is_global, headers
+
+
+def backoff(attempt: int, base=1.0, cap=60.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,36 @@
+# respcache.py
+
+
+class ResponseCache:
+    """Memoized replies for read-only commands.
+
+    Entries are tagged with the schedule version and an expiry (usually the
+    next rift boundary). invalidate() bumps the version after any schedule
+    mutation; expired or stale entries are rebuilt on the next call.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self._entries: dict[tuple, tuple] = {}  # key -> (version, expires_at, value)
+
+    def invalidate(self):
+        self.version += 1
+        self._entries.clear()
+
+    def get(self, name: str, now: float, build, *key):
+        """Cached value for (name, *key); build() -> (value, expires_at or None)."""
+        full_key = (name,) + key
+        entry = self._entries.get(full_key)
+        if entry is not None and entry[0] == self.version and (entry[1] is None or now < entry[1]):
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return entry[2]
+        self.misses[name] = self.misses.get(name, 0) + 1
+        value, expires_at = build()
+        self._entries[full_key] = (self.version, expires_at, value)
+        return value
+
+    def stats(self) -> dict[str, tuple[int, int]]:
+        return {name: (self.hits.get(name, 0), self.misses.get(name, 0))
+                for name in sorted(set(self.hits) | set(self.misses))}
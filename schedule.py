@@ -0,0 +1,253 @@
+# schedule.py
+import re
+import heapq
+import calendar
+from array import array
+from bisect import bisect_left
+
+from timeline import parse_epoch, fmt_epoch
+
+DAY = 86400
+_TIME_RE = re.compile(r"([01]\d|2[0-3]):([0-5]\d)")
+
+
+def _day_offset(time: str) -> int:
+    """Seconds into the day of a UTC "HH:MM" time; ValueError for anything else ("24:30", "0800")."""
+    match = _TIME_RE.fullmatch(time)
+    if match is None:
+        raise ValueError(f"{time!r} is not an HH:MM time between 00:00 and 23:59")
+    return int(match[1]) * 3600 + int(match[2]) * 60
+
+
+class RiftRule:
+    """Every `every_days` days from `anchor`, cycling through `times` (UTC "HH:MM").
+
+    The default cadence is RiftRule("2025-07-30 08:00", 2, ["08:00", "20:00"]):
+    a rift every 48 h on average, alternating morning and evening.
+    """
+
+    def __init__(self, anchor: str, every_days: int, times: list[str], until: str | None = None):
+        if every_days < 1 or not times:
+            raise ValueError("a rule needs every_days >= 1 and at least one time")
+        self.anchor = anchor
+        self.every_days = every_days
+        self.times = list(times)
+        self.until = until
+        self._day0 = calendar.timegm(tuple(map(int, anchor[:10].split("-"))) + (0, 0, 0))
+        self._offsets = [_day_offset(t) for t in self.times]
+        self._until = parse_epoch(until) if until else None
+        self._first = parse_epoch(anchor)
+
+    def _at(self, k: int) -> int:
+        return self._day0 + k * self.every_days * DAY + self._offsets[k % len(self._offsets)]
+
+    def occurrences(self, start: int):
+        """Lazily yield occurrence epochs >= start, ascending."""
+        k = max(0, (start - self._day0) // (self.every_days * DAY) - 1)
+        while True:
+            epoch = self._at(k)
+            k += 1
+            if self._until is not None and epoch > self._until:
+                return
+            if epoch >= start and epoch >= self._first:
+                yield epoch
+
+    def contains(self, epoch: int) -> bool:
+        if epoch < self._first or (self._until is not None and epoch > self._until):
+            return False
+        days, secs = divmod(epoch - self._day0, DAY)
+        if days % self.every_days:
+            return False
+        return self._offsets[(days // self.every_days) % len(self._offsets)] == secs
+
+    def to_row(self) -> tuple:
+        return (self.anchor, self.every_days, ",".join(self.times), self.until)
+
+    @classmethod
+    def from_row(cls, row) -> "RiftRule":
+        anchor, every_days, times, until = row
+        return cls(anchor, int(every_days), times.split(","), until)
+
+    def describe(self) -> str:
+        text = f"every {self.every_days} days at {' / '.join(self.times)} UTC from {self.anchor}"
+        return text + (f" until {self.until}" if self.until else "")
+
+
+class Schedule:
+    """Rules + cancelled rule occurrences + explicit (uploaded or moved) dates.
+
+    Nothing is expanded up front: callers ask for the window they need and
+    occurrences are generated lazily from the rules. Every mutation is also
+    appended to `changes` so the store can persist it in one transaction.
+    """
+
+    def __init__(self, explicit=(), rules=(), exceptions=()):
+        self._explicit = array("q", sorted(set(parse_epoch(s) for s in explicit)))
+        self.rules: list[RiftRule] = list(rules)
+        self._exceptions: set[int] = set(parse_epoch(s) for s in exceptions)
+        self.changes: list[tuple] = []
+
+    def drain_changes(self) -> list[tuple]:
+        changes, self.changes = self.changes, []
+        return changes
+
+    # --- mutation ---
+    def add(self, epochs) -> list[int]:
+        added = []
+        for epoch in sorted(set(epochs)):
+            if self.contains(epoch):
+                continue
+            if epoch in self._exceptions and self.is_rule_occurrence(epoch):
+                self._exceptions.discard(epoch)
+                self.changes.append(("exception-", fmt_epoch(epoch)))
+            else:
+                self._explicit.insert(bisect_left(self._explicit, epoch), epoch)
+                self.changes.append(("explicit+", fmt_epoch(epoch)))
+            added.append(epoch)
+        return added
+
+    def remove(self, epoch: int) -> str | None:
+        """Drop one rift; returns "explicit" or "rule" depending on where it came from."""
+        source = None
+        i = bisect_left(self._explicit, epoch)
+        if i < len(self._explicit) and self._explicit[i] == epoch:
+            del self._explicit[i]
+            self.changes.append(("explicit-", fmt_epoch(epoch)))
+            source = "explicit"
+        if self.is_rule_occurrence(epoch) and epoch not in self._exceptions:
+            self._exceptions.add(epoch)
+            self.changes.append(("exception+", fmt_epoch(epoch)))
+            source = source or "rule"
+        return source
+
+    def move(self, old: int, new: int) -> bool:
+        if self.remove(old) is None:
+            return False
+        self.add([new])
+        return True
+
+    def set_rules(self, rules: list[RiftRule]):
+        self.rules = list(rules)
+        stale = [e for e in self._exceptions if not self.is_rule_occurrence(e)]
+        for epoch in stale:
+            self._exceptions.discard(epoch)
+            self.changes.append(("exception-", fmt_epoch(epoch)))
+        self.changes.append(("rules", [rule.to_row() for rule in self.rules]))
+
+    def adopt_rules(self, rules: list[RiftRule]):
+        """Put `rules` under a list of explicit dates without changing which rifts exist.
+
+        Across the span of the explicit dates, rule occurrences that aren't
+        listed become exceptions and listed dates the rules produce stop being
+        explicit; only the one-offs (e.g. a 19:00 rift) stay explicit.
+        """
+        listed = set(self._explicit)
+        self.set_rules(rules)
+        if not listed:
+            return
+        start, end = min(listed), max(listed)
+        for epoch in self.window(start, end):
+            if epoch not in listed:
+                self._exceptions.add(epoch)
+                self.changes.append(("exception+", fmt_epoch(epoch)))
+        covered = [epoch for epoch in self._explicit if self.is_rule_occurrence(epoch)]
+        for epoch in covered:
+            del self._explicit[bisect_left(self._explicit, epoch)]
+            self.changes.append(("explicit-", fmt_epoch(epoch)))
+
+    # --- bulk edits (each is one batch of changes, persisted in one transaction) ---
+    def shift(self, start: int, end: int, seconds: int) -> list[tuple[int, int]]:
+        """Move every rift in [start, end] by `seconds`; returns (old, new) pairs.
+
+        Raises ValueError (naming the rift) if a moved rift would land on one
+        outside the range; nothing is changed in that case.
+        """
+        moving = self.window(start, end)
+        moved = set(moving)
+        for epoch in moving:
+            if epoch + seconds not in moved and self.contains(epoch + seconds):
+                raise ValueError(fmt_epoch(epoch + seconds))
+        for epoch in moving:
+            self.remove(epoch)
+        self.add(epoch + seconds for epoch in moving)
+        return [(epoch, epoch + seconds) for epoch in moving]
+
+    def remove_range(self, start: int, end: int) -> list[int]:
+        removed = self.window(start, end)
+        for epoch in removed:
+            self.remove(epoch)
+        return removed
+
+    def replace_window(self, start: int, end: int, epochs) -> tuple[list[int], list[int]]:
+        """Make [start, end] hold exactly `epochs` (those outside it are ignored); returns (added, removed)."""
+        new = {epoch for epoch in epochs if start <= epoch <= end}
+        old = set(self.window(start, end))
+        removed = sorted(old - new)
+        for epoch in removed:
+            self.remove(epoch)
+        return self.add(new - old), removed
+
+    def forget_before(self, epoch: int) -> int:
+        """Drop explicit dates and exceptions before `epoch` without recording changes
+        (the store deletes them itself when it archives them)."""
+        i = bisect_left(self._explicit, epoch)
+        del self._explicit[:i]
+        stale = {e for e in self._exceptions if e < epoch}
+        self._exceptions -= stale
+        return i + len(stale)
+
+    def snapshot(self) -> tuple:
+        """Opaque copy of the schedule for restore() (undo)."""
+        return array("q", self._explicit), list(self.rules), frozenset(self._exceptions)
+
+    def restore(self, snapshot: tuple):
+        """Return to a snapshot, recording only the difference as changes."""
+        explicit, rules, exceptions = snapshot
+        old, new = set(self._explicit), set(explicit)
+        self.changes += [("explicit-", fmt_epoch(e)) for e in sorted(old - new)]
+        self.changes += [("explicit+", fmt_epoch(e)) for e in sorted(new - old)]
+        self.changes += [("exception-", fmt_epoch(e)) for e in sorted(self._exceptions - exceptions)]
+        self.changes += [("exception+", fmt_epoch(e)) for e in sorted(exceptions - self._exceptions)]
+        if [rule.to_row() for rule in rules] != [rule.to_row() for rule in self.rules]:
+            self.changes.append(("rules", [rule.to_row() for rule in rules]))
+        self._explicit = array("q", explicit)
+        self.rules = list(rules)
+        self._exceptions = set(exceptions)
+
+    # --- queries ---
+    def is_explicit(self, epoch: int) -> bool:
+        i = bisect_left(self._explicit, epoch)
+        return i < len(self._explicit) and self._explicit[i] == epoch
+
+    def is_rule_occurrence(self, epoch: int) -> bool:
+        return any(rule.contains(epoch) for rule in self.rules)
+
+    def contains(self, epoch: int) -> bool:
+        if self.is_explicit(epoch):
+            return True
+        return epoch not in self._exceptions and self.is_rule_occurrence(epoch)
+
+    def iter_from(self, start: int):
+        """Lazily yield every rift epoch >= start, ascending and de-duplicated."""
+        streams = [iter(self._explicit[bisect_left(self._explicit, start):])]
+        streams += [rule.occurrences(start) for rule in self.rules]
+        previous = None
+        for epoch in heapq.merge(*streams):
+            if epoch == previous or (epoch in self._exceptions and not self.is_explicit(epoch)):
+                continue
+            previous = epoch
+            yield epoch
+
+    def window(self, start: int, end: int) -> list[int]:
+        out = []
+        for epoch in self.iter_from(start):
+            if epoch > end:
+                break
+            out.append(epoch)
+        return out
+
+    def first(self) -> int | None:
+        return next(self.iter_from(-2**62), None)
+
+    def explicit_count(self) -> int:
+        return len(self._explicit)
@@ -0,0 +1,170 @@
+# scheduler.py
+import heapq
+import asyncio
+import itertools
+from collections.abc import Hashable
+
+from clock import SystemClock
+
+MAX_SLEEP = 300  # re-check the wall clock at least every 5 min
+
+
+class _Entry:
+    __slots__ = ("when", "seq", "rift", "delta", "callback", "args", "cancelled")
+
+    def __init__(self, when, seq, rift, delta, callback, args):
+        self.when = when
+        self.seq = seq
+        self.rift = rift
+        self.delta = delta
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.when, self.seq) < (other.when, other.seq)
+
+
+class ReminderScheduler:
+    """One dispatcher coroutine over a min-heap of reminder fire times.
+
+    Entries are keyed by (rift, delta), where `rift` is any hashable key
+    (the bot uses (guild_id, rift string)). Cancelling marks the entry dead and
+    drops it from the index; dead heap entries are skipped on pop and purged
+    once they outnumber the live ones. A fired entry stays addressable as an
+    in-flight task until its callback returns, so cancel() still reaches it.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or SystemClock()
+        self._heap: list[_Entry] = []
+        self._by_rift: dict[Hashable, dict[int, _Entry]] = {}
+        self._seq = itertools.count()
+        self._dead = 0
+        self._wake = asyncio.Event()
+        self._inflight: dict[Hashable, dict[int, asyncio.Task]] = {}
+        self._task: asyncio.Task | None = None
+
+    # --- queries ---
+    def __len__(self):
+        return len(self._heap) - self._dead
+
+    def __contains__(self, rift: Hashable):
+        return rift in self._by_rift
+
+    def rift_count(self) -> int:
+        return len(self._by_rift)
+
+    def rifts(self) -> list[Hashable]:
+        """Rifts that still have at least one pending or in-flight reminder."""
+        return list(self._by_rift.keys() | self._inflight.keys())
+
+    def has(self, rift: Hashable, delta: int) -> bool:
+        return delta in self._by_rift.get(rift, ()) or delta in self._inflight.get(rift, ())
+
+    def pending(self, rift: Hashable) -> list[int]:
+        """Offsets (seconds) still pending or in flight for a rift."""
+        return sorted(self._by_rift.get(rift, {}).keys() | self._inflight.get(rift, {}).keys(), reverse=True)
+
+    def inflight_count(self) -> int:
+        return sum(len(tasks) for tasks in self._inflight.values())
+
+    def next_fire(self) -> float | None:
+        self._drop_dead_head()
+        return self._heap[0].when if self._heap else None
+
+    def is_alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # --- mutation ---
+    def schedule(self, when: float, rift: Hashable, delta: int, callback, *args):
+        """Add (or replace) the reminder for (rift, delta) firing at epoch `when`."""
+        self.cancel(rift, delta)
+        entry = _Entry(when, next(self._seq), rift, delta, callback, args)
+        heapq.heappush(self._heap, entry)
+        self._by_rift.setdefault(rift, {})[delta] = entry
+        if self._heap[0] is entry:
+            self._wake.set()
+
+    def cancel(self, rift: Hashable, delta: int) -> bool:
+        task = self._inflight.get(rift, {}).get(delta)
+        if task is not None:
+            task.cancel()
+        entries = self._by_rift.get(rift)
+        if not entries or delta not in entries:
+            return task is not None
+        self._kill(entries.pop(delta))
+        if not entries:
+            del self._by_rift[rift]
+        return True
+
+    def cancel_rift(self, rift: Hashable) -> int:
+        tasks = self._inflight.get(rift, {})
+        for task in list(tasks.values()):
+            task.cancel()
+        entries = self._by_rift.pop(rift, {})
+        for entry in entries.values():
+            self._kill(entry)
+        return len(entries) + len(tasks)
+
+    def stop(self):
+        """Stop dispatching (entries stay queued until start() is called again)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def clear(self):
+        for tasks in list(self._inflight.values()):
+            for task in list(tasks.values()):
+                task.cancel()
+        self._heap.clear()
+        self._by_rift.clear()
+        self._dead = 0
+        self._wake.set()
+
+    def _kill(self, entry: _Entry):
+        entry.cancelled = True
+        self._dead += 1
+        if self._dead > 64 and self._dead > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if not e.cancelled]
+            heapq.heapify(self._heap)
+            self._dead = 0
+
+    def _drop_dead_head(self):
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._dead -= 1
+
+    # --- dispatcher ---
+    def start(self) -> asyncio.Task:
+        if not self.is_alive():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            self._drop_dead_head()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            delay = self._heap[0].when - self.clock.time()
+            if delay > 0:
+                await self.clock.wait(self._wake, min(delay, MAX_SLEEP))
+                continue
+            entry = heapq.heappop(self._heap)
+            entries = self._by_rift.get(entry.rift)
+            if entries is not None:
+                entries.pop(entry.delta, None)
+                if not entries:
+                    del self._by_rift[entry.rift]
+            task = asyncio.create_task(entry.callback(*entry.args))
+            self._inflight.setdefault(entry.rift, {})[entry.delta] = task
+            task.add_done_callback(lambda t, rift=entry.rift, delta=entry.delta: self._done(rift, delta, t))
+
+    def _done(self, rift: Hashable, delta: int, task: asyncio.Task):
+        tasks = self._inflight.get(rift)
+        if tasks is not None and tasks.get(delta) is task:
+            del tasks[delta]
+            if not tasks:
+                del self._inflight[rift]
@@ -0,0 +1,217 @@
+# simulate.py
+"""Replay the reminder scheduler against a virtual clock.
+
+    python simulate.py --start "2025-07-29 00:00" --end "2025-10-01 00:00" --check
+    python simulate.py --start ... --end ... --scenario edits.json --out run.tsv
+
+A scenario is JSON: [{"at": "YYYY-MM-DD HH:MM", "action": ..., ...}, ...]
+    {"action": "delay_next_rift", "minutes": 30}
+    {"action": "uploadics", "file": "season.ics"}
+    {"action": "set_rift_rule", "start": "...", "every_days": 2, "times": "08:00,20:00"}
+    {"action": "shift_rifts", "start": "2025-08-04", "end": "2025-08-10", "minutes": 60}
+    {"action": "delete_rifts", "start": "...", "end": "..."}
+    {"action": "undo_edit"}
+    {"action": "reconnect"}
+    {"action": "restart", "down_minutes": 8}
+
+Every message the bot would send is written as one TSV line (virtual time,
+channel, content), so two builds can be diffed line by line.
+"""
+import os
+import re
+import sys
+import json
+import random
+import asyncio
+import argparse
+import tempfile
+
+os.environ.setdefault("RIFTS_DB", os.path.join(tempfile.mkdtemp(prefix="rift-sim-"), "rifts.db"))
+
+import main  # noqa: E402  (import after RIFTS_DB is pointed at a scratch store)
+from clock import VirtualClock  # noqa: E402
+from schedule import Schedule  # noqa: E402
+from timeline import parse_epoch, fmt_epoch  # noqa: E402
+from ratelimit import RouteLimiter  # noqa: E402
+from bench.fake_discord import FakeHTTP, FakeInteraction, FakeAttachment  # noqa: E402
+
+outages: list[tuple[float, float]] = []  # (down, up) virtual times of simulated restarts
+_REMINDER_RE = re.compile(r"<t:(\d+):.*?\*\*(\d+) minutes\*\*|\*\*(\d+) minutes\*\*.*?<t:(\d+):", re.S)
+
+
+class RecordingChannel:
+    def __init__(self, channel_id: int, clock: VirtualClock, sent: list):
+        self.id = channel_id
+        self.mention = f"<#{channel_id}>"
+        self._clock = clock
+        self._sent = sent
+
+    async def send(self, content=None, **kwargs):
+        self._sent.append((self._clock.time(), self.id, content or ""))
+
+
+async def _drain(lane):
+    """Stand-in for sender_loop: deliver instantly at the current virtual time."""
+    while True:
+        route, func, args, kwargs, _ = await lane.get()
+        try:
+            await func(*args, **kwargs)
+        finally:
+            lane.task_done()
+
+
+async def _apply(event: dict, http: FakeHTTP):
+    action = event["action"]
+    interaction = FakeInteraction(http, action)
+    if action == "delay_next_rift":
+        await main.delay_next_rift.callback(interaction, int(event["minutes"]))
+    elif action == "uploadics":
+        with open(event["file"], "rb") as f:
+            data = f.read()
+        await main.uploadics.callback(interaction, FakeAttachment(os.path.basename(event["file"]), data))
+    elif action == "set_rift_rule":
+        await main.set_rift_rule.callback(interaction, event["start"], int(event.get("every_days", 2)),
+                                          event.get("times", "08:00,20:00"), event.get("until"))
+    elif action == "shift_rifts":
+        await main.shift_rifts.callback(interaction, event["start"], event["end"], int(event["minutes"]))
+    elif action == "delete_rifts":
+        await main.delete_rifts.callback(interaction, event["start"], event["end"])
+    elif action == "undo_edit":
+        await main.undo_edit.callback(interaction)
+    elif action == "reconnect":
+        main._started = True
+        await main.on_ready()
+    elif action == "restart":
+        # The process dies: nothing fires while it is down, then a fresh start catches up
+        clock = main.clock
+        down = clock.time()
+        main.scheduler.stop()
+        main.scheduler.clear()
+        await clock.advance_to(down + int(event.get("down_minutes", 5)) * 60)
+        outages.append((down, clock.time()))
+        main.scheduler.start()
+        await main.warm_start()
+    else:
+        raise ValueError(f"unknown scenario action {action!r}")
+
+
+async def simulate(start: int, end: int, events: list[dict], schedule: Schedule | None = None) -> list:
+    clock = VirtualClock(start)
+    main.clock = clock
+    main.scheduler.clock = clock
+    main.coalescer.clock = clock
+    main.store.inline = True  # a ledger claim must not race the virtual clock
+    sent: list = []
+    outages.clear()
+    channels: dict[int, RecordingChannel] = {}
+
+    async def get_text_channel(ch_id: int):
+        return channels.setdefault(ch_id, RecordingChannel(ch_id, clock, sent))
+    main.get_text_channel = get_text_channel
+    # the real limiter paces on wall-clock time, which never moves here
+    main.limiter = RouteLimiter(route_capacity=10**9, global_capacity=10**9)
+
+    if schedule is not None:
+        main.guilds.default.schedule = schedule
+    main.scheduler.clear()
+    main.refresh_window(main.guilds.default, start)
+    tasks = [main.scheduler.start(), asyncio.ensure_future(main.window_loop()),
+             asyncio.ensure_future(_drain(main.SEND_Q)), asyncio.ensure_future(_drain(main.FAST_Q))]
+    await main.schedule_all_rifts()
+
+    http = FakeHTTP(latency=0.0, jitter=0.0)
+    for event in sorted(events, key=lambda e: parse_epoch(e["at"])):
+        await clock.advance_to(parse_epoch(event["at"]))
+        print(f"⏩ {event['at']} {event['action']}", file=sys.stderr)
+        await _apply(event, http)
+    await clock.advance_to(end)
+    for task in tasks:
+        task.cancel()
+    return sent
+
+
+def _down(at: float) -> bool:
+    return any(down < at <= up for down, up in outages)
+
+
+def check(sent: list, rifts: list[int], end: int) -> tuple[list[str], list[str]]:
+    """Every rift in `rifts` (those fully inside the run) must get exactly one reminder per offset, on time.
+
+    A reminder merged into an earlier one may go out up to COALESCE_SECONDS early;
+    one due during a simulated restart may be missed, or caught up at most
+    CATCHUP_GRACE_SECONDS late. Returns (problems, notes); notes cover reminders already sent for rifts
+    that a later edit moved away, which is expected.
+    """
+    got: dict[int, list[tuple[int, float]]] = {}
+    for at, _, content in sent:
+        for m in _REMINDER_RE.finditer(content):
+            rift = int(m.group(1) or m.group(4))
+            minutes = int(m.group(2) or m.group(3))
+            got.setdefault(rift, []).append((minutes * 60, at))
+    problems, notes = [], []
+    for rift in rifts:
+        reminders = sorted(got.pop(rift, []), reverse=True)
+        offsets = [delta for delta, _ in reminders]
+        expected = sorted(main.REMINDER_OFFSETS, reverse=True)
+        missed = [d for d in expected if _down(rift - d) and d not in offsets]
+        if missed:
+            notes.append(f"{fmt_epoch(rift)}: {', '.join(f'{d // 60}min' for d in missed)} missed during a restart")
+        if sorted(offsets + missed, reverse=True) != expected:
+            problems.append(f"{fmt_epoch(rift)}: offsets {offsets}")
+        for delta, at in reminders:
+            late = int(at) - (rift - delta)
+            if not -main.COALESCE_SECONDS <= late <= (main.CATCHUP_GRACE_SECONDS if _down(rift - delta) else 0):
+                problems.append(f"{fmt_epoch(rift)}: {delta // 60}min reminder sent {at - (rift - delta):+.0f}s off")
+    for rift, reminders in sorted(got.items()):
+        if rift < end:
+            notes.append(f"{fmt_epoch(rift)}: {len(reminders)} reminders sent before it was moved/removed")
+    return problems, notes
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", required=True, help="virtual start, 'YYYY-MM-DD HH:MM' UTC")
+    parser.add_argument("--end", required=True, help="virtual end, 'YYYY-MM-DD HH:MM' UTC")
+    parser.add_argument("--scenario", help="JSON list of timed edits/reconnects")
+    parser.add_argument("--schedule", help="JSON list of 'YYYY-MM-DD HH:MM' to use instead of the bot's store")
+    parser.add_argument("--out", help="write the send timeline here (default: stdout)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the motivational line picker")
+    parser.add_argument("--check", action="store_true", help="verify offsets; exit 1 on problems")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    start, end = parse_epoch(args.start), parse_epoch(args.end)
+    events = []
+    if args.scenario:
+        with open(args.scenario) as f:
+            events = json.load(f)
+    schedule = None
+    if args.schedule:
+        with open(args.schedule) as f:
+            schedule = Schedule(json.load(f))
+
+    sent = asyncio.run(simulate(start, end, events, schedule))
+    lines = [f"{fmt_epoch(int(at))}:{int(at) % 60:02d}\t{ch}\t{content.replace(chr(10), ' | ')}"
+             for at, ch, content in sent]
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write("\n".join(lines) + "\n")
+    else:
+        print("\n".join(lines))
+    print(f"📤 {len(sent)} messages simulated", file=sys.stderr)
+
+    if args.check:
+        # archived rifts are gone from the live schedule; rifts_between() reads them from the history
+        rifts = asyncio.run(main.rifts_between(main.guilds.default, start + max(main.REMINDER_OFFSETS), end))
+        problems, notes = check(sent, rifts, end)
+        for note in notes:
+            print(f"ℹ️ {note}", file=sys.stderr)
+        for problem in problems:
+            print(f"❌ {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+        print("✅ every rift got every reminder on time", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,395 @@
+# storage.py
+import os
+import json
+import asyncio
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from timeline import fmt_epoch
+from schedule import Schedule, RiftRule
+
+log = logging.getLogger("rift")
+
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS rifts ("
+    "guild INTEGER NOT NULL, rift TEXT NOT NULL, PRIMARY KEY (guild, rift)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS exceptions ("
+    "guild INTEGER NOT NULL, rift TEXT NOT NULL, PRIMARY KEY (guild, rift)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS rules (guild INTEGER NOT NULL, pos INTEGER NOT NULL, "
+    "anchor TEXT, every_days INTEGER, times TEXT, until TEXT, PRIMARY KEY (guild, pos))",
+    "CREATE TABLE IF NOT EXISTS guilds (guild INTEGER PRIMARY KEY, channel_id INTEGER, role_id INTEGER, "
+    "editor_roles TEXT, announce_channel_id INTEGER, help_channel_id INTEGER)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    # Delivery lease/ledger: one row per (guild, rift, offset) ever claimed
+    "CREATE TABLE IF NOT EXISTS deliveries (guild INTEGER NOT NULL, rift TEXT NOT NULL, delta INTEGER NOT NULL, "
+    "owner TEXT, lease_until REAL, sent_at REAL, PRIMARY KEY (guild, rift, delta)) WITHOUT ROWID",
+    # DM subscriptions: the key order makes "who wants this guild's 15min reminder" one index range
+    "CREATE TABLE IF NOT EXISTS subscriptions (guild INTEGER NOT NULL, delta INTEGER NOT NULL, "
+    "user_id INTEGER NOT NULL, PRIMARY KEY (guild, delta, user_id)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS dm_channels (user_id INTEGER PRIMARY KEY, channel_id INTEGER, closed_until REAL)",
+    # Append-only archive of past rifts: epoch ints, explicit = 1 for uploaded/moved dates, reminders = sends
+    "CREATE TABLE IF NOT EXISTS history (guild INTEGER NOT NULL, rift INTEGER NOT NULL, explicit INTEGER NOT NULL, "
+    "reminders INTEGER NOT NULL, PRIMARY KEY (guild, rift)) WITHOUT ROWID",
+)
+
+
+class RiftStore:
+    """SQLite (WAL) schedule store with incremental, off-loop writes.
+
+    All statements run on one dedicated thread, so writes are serialized and
+    the event loop never touches the disk. Each call is its own transaction;
+    a crash leaves either the old or the new state, never a truncated file.
+    Every row is keyed by guild; guild 0 is the default (env-configured) one.
+    Several bot processes may share the file; SQLite's locking serializes them.
+    """
+
+    def __init__(self, path: str = "rifts.db"):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rift-store")
+        self._db: sqlite3.Connection | None = None
+        self.inline = False  # simulate.py: run statements on the loop thread so replays stay deterministic
+
+    # --- thread side ---
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA busy_timeout=5000")  # other shard processes write the same file
+            self._migrate(db)
+            for statement in _SCHEMA:
+                db.execute(statement)
+            self._db = db
+        return self._db
+
+    @staticmethod
+    def _migrate(db):
+        """Single-guild stores (no guild column) become guild 0."""
+        def needed():
+            columns = [row[1] for row in db.execute("PRAGMA table_info(rifts)")]
+            return columns and "guild" not in columns
+        if not needed():
+            return
+        db.execute("BEGIN IMMEDIATE")
+        if not needed():  # another process migrated while we waited for the lock
+            db.execute("ROLLBACK")
+            return
+        log.info("📦 Migrating rift store to per-guild tables")
+        for table in ("rifts", "exceptions", "rules"):
+            db.execute(f"ALTER TABLE {table} RENAME TO {table}_v1")
+        for statement in _SCHEMA:
+            db.execute(statement)
+        db.execute("INSERT INTO rifts (guild, rift) SELECT 0, rift FROM rifts_v1")
+        db.execute("INSERT INTO exceptions (guild, rift) SELECT 0, rift FROM exceptions_v1")
+        db.execute("INSERT INTO rules (guild, pos, anchor, every_days, times, until) "
+                   "SELECT 0, pos, anchor, every_days, times, until FROM rules_v1")
+        for table in ("rifts", "exceptions", "rules"):
+            db.execute(f"DROP TABLE {table}_v1")
+        db.execute("COMMIT")
+
+    def _tx(self, fn, *args):
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(db, *args)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        return result
+
+    def _snapshot(self, fn, *args):
+        """Read-only fn in a deferred transaction: one consistent WAL snapshot, no write lock."""
+        db = self._conn()
+        db.execute("BEGIN")
+        try:
+            return fn(db, *args)
+        finally:
+            db.execute("COMMIT")
+
+    @staticmethod
+    def _insert(db, guild, rifts):
+        cur = db.executemany("INSERT OR IGNORE INTO rifts (guild, rift) VALUES (?, ?)", ((guild, r) for r in rifts))
+        return cur.rowcount
+
+    @staticmethod
+    def _apply(db, guild, changes):
+        for op, value in changes:
+            if op == "explicit+":
+                db.execute("INSERT OR IGNORE INTO rifts (guild, rift) VALUES (?, ?)", (guild, value))
+            elif op == "explicit-":
+                db.execute("DELETE FROM rifts WHERE guild = ? AND rift = ?", (guild, value))
+            elif op == "exception+":
+                db.execute("INSERT OR IGNORE INTO exceptions (guild, rift) VALUES (?, ?)", (guild, value))
+            elif op == "exception-":
+                db.execute("DELETE FROM exceptions WHERE guild = ? AND rift = ?", (guild, value))
+            elif op == "rules":
+                db.execute("DELETE FROM rules WHERE guild = ?", (guild,))
+                db.executemany("INSERT INTO rules (guild, pos, anchor, every_days, times, until) "
+                               "VALUES (?, ?, ?, ?, ?, ?)",
+                               ((guild, pos) + tuple(row) for pos, row in enumerate(value)))
+            else:
+                raise ValueError(f"unknown schedule change {op!r}")
+        return len(changes)
+
+    @staticmethod
+    def _read(db, guild) -> tuple[list[str], list[tuple], list[str]]:
+        explicit = [row[0] for row in db.execute("SELECT rift FROM rifts WHERE guild = ? ORDER BY rift", (guild,))]
+        rules = [tuple(row) for row in db.execute(
+            "SELECT anchor, every_days, times, until FROM rules WHERE guild = ? ORDER BY pos", (guild,))]
+        exceptions = [row[0] for row in db.execute(
+            "SELECT rift FROM exceptions WHERE guild = ? ORDER BY rift", (guild,))]
+        return explicit, rules, exceptions
+
+    def _load_guild(self, db, guild, default_rules):
+        """A guild's schedule; the first load gives a guild without rules `default_rules`,
+        with exceptions wherever its explicit dates (e.g. an imported rifts.json) skip one."""
+        key = f"seeded:{guild}"
+        if not db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            explicit, rules, exceptions = self._read(db, guild)
+            if default_rules and not rules:
+                schedule = Schedule(explicit, (), exceptions)
+                schedule.adopt_rules([RiftRule.from_row(row) for row in default_rules])
+                self._apply(db, guild, schedule.drain_changes())
+            db.execute("INSERT INTO meta (key, value) VALUES (?, '1')", (key,))
+        return self._read(db, guild)
+
+    @staticmethod
+    def _claim(db, key, owner, now, ttl) -> bool:
+        row = db.execute("SELECT lease_until, sent_at FROM deliveries WHERE guild = ? AND rift = ? AND delta = ?",
+                         key).fetchone()
+        if row is not None and (row[1] is not None or row[0] > now):
+            return False  # already sent, or another owner's lease is still live
+        db.execute("INSERT OR REPLACE INTO deliveries (guild, rift, delta, owner, lease_until, sent_at) "
+                   "VALUES (?, ?, ?, ?, ?, NULL)", tuple(key) + (owner, now + ttl))
+        return True
+
+    @staticmethod
+    def _mark_sent(db, keys, now):
+        db.executemany("UPDATE deliveries SET sent_at = ? WHERE guild = ? AND rift = ? AND delta = ?",
+                       ((now,) + tuple(key) for key in keys))
+
+    @staticmethod
+    def _release(db, keys, owner):
+        db.executemany("DELETE FROM deliveries WHERE guild = ? AND rift = ? AND delta = ? "
+                       "AND owner = ? AND sent_at IS NULL", (tuple(key) + (owner,) for key in keys))
+
+    @staticmethod
+    def _delivered(db, guild, since):
+        return {(rift, delta) for rift, delta in db.execute(
+            "SELECT rift, delta FROM deliveries WHERE guild = ? AND rift >= ? AND sent_at IS NOT NULL", (guild, since))}
+
+    @staticmethod
+    def _release_previous(db, worker, owner):
+        return db.execute("DELETE FROM deliveries WHERE sent_at IS NULL AND owner LIKE ? AND owner != ?",
+                          (worker + ":%", owner)).rowcount
+
+    @staticmethod
+    def _prune_deliveries(db, before):
+        return db.execute("DELETE FROM deliveries WHERE rift < ?", (before,)).rowcount
+
+    @staticmethod
+    def _subscribe(db, guild, user_id, deltas):
+        db.execute("DELETE FROM subscriptions WHERE guild = ? AND user_id = ?", (guild, user_id))
+        db.executemany("INSERT INTO subscriptions (guild, delta, user_id) VALUES (?, ?, ?)",
+                       ((guild, delta, user_id) for delta in deltas))
+        db.execute("UPDATE dm_channels SET closed_until = NULL WHERE user_id = ?", (user_id,))
+
+    @staticmethod
+    def _subscription(db, guild, user_id):
+        return sorted((row[0] for row in db.execute(
+            "SELECT delta FROM subscriptions WHERE guild = ? AND user_id = ?", (guild, user_id))), reverse=True)
+
+    @staticmethod
+    def _subscribers(db, guild, delta, now):
+        return db.execute(
+            "SELECT s.user_id, d.channel_id FROM subscriptions s LEFT JOIN dm_channels d ON d.user_id = s.user_id "
+            "WHERE s.guild = ? AND s.delta = ? AND (d.closed_until IS NULL OR d.closed_until <= ?)",
+            (guild, delta, now)).fetchall()
+
+    @staticmethod
+    def _subscriber_count(db, guild):
+        return db.execute("SELECT COUNT(DISTINCT user_id) FROM subscriptions WHERE guild = ?", (guild,)).fetchone()[0]
+
+    @staticmethod
+    def _set_dm_channel(db, user_id, channel_id):
+        db.execute("INSERT INTO dm_channels (user_id, channel_id) VALUES (?, ?) "
+                   "ON CONFLICT (user_id) DO UPDATE SET channel_id = excluded.channel_id", (user_id, channel_id))
+
+    @staticmethod
+    def _dm_closed(db, user_id, until):
+        db.execute("INSERT INTO dm_channels (user_id, closed_until) VALUES (?, ?) "
+                   "ON CONFLICT (user_id) DO UPDATE SET closed_until = excluded.closed_until", (user_id, until))
+
+    @staticmethod
+    def _archive(db, guild, rows, until, before):
+        db.executemany(
+            "INSERT OR IGNORE INTO history (guild, rift, explicit, reminders) VALUES (?, ?, ?, "
+            "(SELECT COUNT(*) FROM deliveries WHERE guild = ? AND rift = ? AND sent_at IS NOT NULL))",
+            ((guild, epoch, explicit, guild, fmt_epoch(epoch)) for epoch, explicit in rows))
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"archived:{guild}", str(until)))
+        cutoff = fmt_epoch(before)
+        db.execute("DELETE FROM rifts WHERE guild = ? AND rift < ?", (guild, cutoff))
+        db.execute("DELETE FROM exceptions WHERE guild = ? AND rift < ?", (guild, cutoff))
+        return len(rows)
+
+    @staticmethod
+    def _archived_until(db, guild):
+        row = db.execute("SELECT value FROM meta WHERE key = ?", (f"archived:{guild}",)).fetchone()
+        return int(row[0]) if row else None
+
+    @staticmethod
+    def _last_rifts(db, guild, n):
+        return [row[0] for row in db.execute(
+            "SELECT rift FROM history WHERE guild = ? ORDER BY rift DESC LIMIT ?", (guild, n))]
+
+    @staticmethod
+    def _history_between(db, guild, start, end):
+        return [row[0] for row in db.execute(
+            "SELECT rift FROM history WHERE guild = ? AND rift BETWEEN ? AND ? ORDER BY rift", (guild, start, end))]
+
+    @staticmethod
+    def _monthly_stats(db, guild, months):
+        return [tuple(row) for row in db.execute(
+            "SELECT strftime('%Y-%m', rift, 'unixepoch') AS month, COUNT(*), SUM(explicit), SUM(reminders) "
+            "FROM history WHERE guild = ? GROUP BY month ORDER BY month DESC LIMIT ?", (guild, months))]
+
+    @staticmethod
+    def _save_guild(db, row):
+        db.execute("INSERT OR REPLACE INTO guilds (guild, channel_id, role_id, editor_roles, "
+                   "announce_channel_id, help_channel_id) VALUES (?, ?, ?, ?, ?, ?)", row)
+
+    # --- sync API (startup, before the loop runs) ---
+    def load(self, json_path: str = "rifts.json", default_rules=()) -> tuple[list[str], list[tuple], list[str]]:
+        """Default guild's (explicit rifts, rule rows, exceptions), all sorted.
+
+        Imports `json_path` once, then seeds `default_rules` on top of it (see
+        _load_guild), so the listed dates carry on as the rule after the JSON ends.
+        """
+        db = self._conn()
+        imported = db.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+        if not imported:
+            seed = []
+            if os.path.exists(json_path):
+                with open(json_path, "r") as f:
+                    seed = json.load(f)
+                log.info("📥 Importing rifts from JSON", extra={"count": len(seed),
+                                                               "reason": f"{json_path} -> {self.path}"})
+
+            def _seed(db):
+                self._insert(db, 0, seed)
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (json_path,))
+            self._tx(_seed)
+        return self._tx(self._load_guild, 0, list(default_rules))
+
+    def guild_configs(self) -> list[tuple]:
+        """Every configured guild's row; small enough to index up front."""
+        return [tuple(row) for row in self._conn().execute(
+            "SELECT guild, channel_id, role_id, editor_roles, announce_channel_id, help_channel_id FROM guilds")]
+
+    # --- async API (off the event loop) ---
+    async def _run(self, fn, *args):
+        if self.inline:
+            return self._tx(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._tx, fn, *args)
+
+    async def _query(self, fn, *args):
+        """Like _run for read-only fn, without BEGIN IMMEDIATE's write lock."""
+        if self.inline:
+            return self._snapshot(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._snapshot, fn, *args)
+
+    async def apply(self, changes: list[tuple], guild: int = 0) -> int:
+        """Persist a batch of Schedule changes as one transaction."""
+        if not changes:
+            return 0
+        return await self._run(self._apply, guild, list(changes))
+
+    async def load_guild(self, guild: int, default_rules=()) -> tuple[list[str], list[tuple], list[str]]:
+        """Like load() for any guild; a guild's first load seeds `default_rules`."""
+        return await self._run(self._load_guild, guild, list(default_rules))
+
+    async def read_guild(self, guild: int) -> tuple[list[str], list[tuple], list[str]]:
+        """Re-read a guild's schedule as another process last saved it."""
+        return await self._query(self._read, guild)
+
+    async def save_guild(self, row: tuple):
+        await self._run(self._save_guild, row)
+
+    # --- delivery lease ---
+    # A reminder is sent only by whoever claims (guild, rift, offset) first.
+    # The claim is a lease: if its holder dies before marking the reminder
+    # sent, the lease lapses after `ttl` and another process may take over.
+    # A crash between the Discord call and mark_sent() is the one window in
+    # which a takeover could repeat a message.
+    async def claim(self, key: tuple, owner: str, now: float, ttl: float) -> bool:
+        """Take the send lease for key = (guild, rift, offset); False if sent or held elsewhere."""
+        return await self._run(self._claim, key, owner, now, ttl)
+
+    async def mark_sent(self, keys: list[tuple], now: float):
+        await self._run(self._mark_sent, list(keys), now)
+
+    async def release(self, keys: list[tuple], owner: str):
+        """Give back unsent leases (reminder cancelled or moved)."""
+        await self._run(self._release, list(keys), owner)
+
+    async def delivered(self, guild: int, since: str) -> set[tuple[str, int]]:
+        """(rift, offset) pairs already sent for rifts at or after `since`."""
+        return await self._query(self._delivered, guild, since)
+
+    async def release_previous(self, worker: str, owner: str) -> int:
+        """Warm restart: drop unsent leases left by earlier incarnations of `worker`.
+
+        Owners are 'worker:pid'; a new process for the same worker means the
+        old one is gone, so its claimed-but-unsent reminders are free again.
+        """
+        return await self._run(self._release_previous, worker, owner)
+
+    # --- DM subscriptions ---
+    async def subscribe(self, guild: int, user_id: int, deltas: list[int]):
+        """Replace a member's DM offsets for a guild (empty = unsubscribe); also re-opens closed DMs."""
+        await self._run(self._subscribe, guild, user_id, list(deltas))
+
+    async def subscription(self, guild: int, user_id: int) -> list[int]:
+        return await self._query(self._subscription, guild, user_id)
+
+    async def subscribers(self, guild: int, delta: int, now: float) -> list[tuple[int, int | None]]:
+        """(user_id, cached DM channel ID or None) for every reachable subscriber of an offset."""
+        return await self._query(self._subscribers, guild, delta, now)
+
+    async def subscriber_count(self, guild: int) -> int:
+        return await self._query(self._subscriber_count, guild)
+
+    async def set_dm_channel(self, user_id: int, channel_id: int):
+        await self._run(self._set_dm_channel, user_id, channel_id)
+
+    async def mark_dm_closed(self, user_id: int, until: float):
+        """Skip this user's DMs until `until` (they blocked the bot or closed DMs)."""
+        await self._run(self._dm_closed, user_id, until)
+
+    # --- history ---
+    async def archive(self, guild: int, rows: list[tuple[int, int]], until: int, before: int) -> int:
+        """Append (epoch, explicit) rows for rifts up to `until` to the history and drop
+        live explicit dates / exceptions older than `before`, in one transaction."""
+        return await self._run(self._archive, guild, list(rows), until, before)
+
+    async def archived_until(self, guild: int) -> int | None:
+        """Epoch up to which the guild's rifts are in the history (None: never archived)."""
+        return await self._query(self._archived_until, guild)
+
+    async def last_rifts(self, guild: int, n: int) -> list[int]:
+        """The n most recent archived rift epochs, newest first."""
+        return await self._query(self._last_rifts, guild, n)
+
+    async def history_between(self, guild: int, start: int, end: int) -> list[int]:
+        return await self._query(self._history_between, guild, start, end)
+
+    async def monthly_stats(self, guild: int, months: int = 6) -> list[tuple[str, int, int, int]]:
+        """(YYYY-MM, rifts, explicit rifts, reminders sent) per month, newest first."""
+        return await self._query(self._monthly_stats, guild, months)
+
+    async def prune_deliveries(self, before: str) -> int:
+        """Forget ledger rows of rifts earlier than `before` ('YYYY-MM-DD HH:MM')."""
+        return await self._run(self._prune_deliveries, before)
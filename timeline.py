@@ -0,0 +1,61 @@
+# timeline.py
+import time
+import calendar
+from array import array
+from bisect import bisect_left, bisect_right
+
+FMT = "%Y-%m-%d %H:%M"
+
+
+def parse_epoch(s: str) -> int:
+    """'YYYY-MM-DD HH:MM' (UTC) -> epoch seconds."""
+    return calendar.timegm(time.strptime(s, FMT))
+
+
+def fmt_epoch(epoch: int) -> str:
+    return time.strftime(FMT, time.gmtime(epoch))
+
+
+# Rifts are stored as text; fmt_epoch() output reads back through parse_epoch() only in this range
+EPOCH_MIN = parse_epoch("2000-01-01 00:00")
+EPOCH_MAX = parse_epoch("9999-12-31 23:59")
+
+
+class RiftTimeline:
+    """Sorted, array-backed epoch index of the materialized rift window.
+
+    Lookups are binary searches so they don't slow down as rifts pile up.
+    """
+
+    def __init__(self, epochs=()):
+        self._epochs = array("q")
+        self.rebuild(epochs)
+
+    def rebuild(self, epochs):
+        self._epochs = array("q", sorted(set(epochs)))
+
+    # --- queries ---
+    def __len__(self):
+        return len(self._epochs)
+
+    def __contains__(self, epoch: int):
+        i = bisect_left(self._epochs, epoch)
+        return i < len(self._epochs) and self._epochs[i] == epoch
+
+    def next_after(self, now: float) -> int | None:
+        """First rift strictly after `now`."""
+        i = bisect_right(self._epochs, now)
+        return self._epochs[i] if i < len(self._epochs) else None
+
+    def upcoming(self, now: float) -> array:
+        """All rifts strictly after `now`, oldest first."""
+        return self._epochs[bisect_right(self._epochs, now):]
+
+    def between(self, start: float, end: float) -> array:
+        """Rifts with start <= t <= end."""
+        return self._epochs[bisect_left(self._epochs, start):bisect_right(self._epochs, end)]
+
+    def recent(self, now: float, n: int) -> list[int]:
+        """Up to n rifts at or before `now`, most recent first."""
+        i = bisect_right(self._epochs, now)
+        return list(reversed(self._epochs[max(0, i - n):i]))
@@ -0,0 +1,121 @@
+# watchdog.py
+import os
+import sys
+import time
+import heapq
+import asyncio
+import logging
+import sysconfig
+import threading
+import traceback
+
+import metrics
+
+log = logging.getLogger("rift")
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+
+class Stall:
+    __slots__ = ("started", "duration", "task", "where", "stack")
+
+    def __init__(self, started: float, task: str, where: str, stack: list[str]):
+        self.started = started  # wall clock
+        self.duration = 0.0
+        self.task = task
+        self.where = where
+        self.stack = stack
+
+    def __lt__(self, other: "Stall") -> bool:
+        return self.duration < other.duration
+
+    def summary(self) -> str:
+        return f"{self.duration:.2f}s in {self.task} at {self.where}"
+
+
+def _describe(frame) -> tuple[str, list[str]]:
+    """Innermost frame of our own code (not stdlib / site-packages), plus the formatted stack."""
+    frames = traceback.extract_stack(frame)
+    own = [f for f in frames if not f.filename.startswith(_STDLIB) and "site-packages" not in f.filename]
+    top = (own or frames)[-1]
+    where = f"{os.path.basename(top.filename)}:{top.lineno} {top.name}"
+    return where, traceback.format_list(frames[-12:])
+
+
+class Watchdog:
+    """Detect event-loop stalls from a side thread and say what was running.
+
+    A loop task stamps a heartbeat every `interval`; when the thread sees it
+    older than `threshold`, the loop is blocked right now, so it grabs the
+    loop thread's stack and current task. The stall's length is known once
+    the heartbeat resumes; the `keep` worst are kept for /debug_tasks. With
+    `restart_after`, a loop wedged that long exits the process (the launcher
+    or host restarts it).
+    """
+
+    def __init__(self, threshold: float = 0.25, interval: float = 0.05, keep: int = 10,
+                 restart_after: float | None = None):
+        self.threshold = threshold
+        self.interval = interval
+        self.keep = keep
+        self.restart_after = restart_after
+        self.stalls = 0
+        self.worst: list[Stall] = []  # min-heap of the `keep` longest
+        self.current: Stall | None = None
+        self._beat = time.monotonic()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread = 0
+
+    def start(self):
+        """Call from the loop thread."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def top(self, n: int = 5) -> list[Stall]:
+        return sorted(self.worst, reverse=True)[:n]
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _capture(self, blocked_for: float) -> Stall:
+        task = asyncio.current_task(self._loop)
+        name = "callback"
+        if task is not None:
+            coro = task.get_coro()
+            name = f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+        frame = sys._current_frames().get(self._loop_thread)
+        where, stack = _describe(frame) if frame is not None else ("?", [])
+        return Stall(time.time() - blocked_for, name, where, stack)
+
+    def _finish(self, stall: Stall, duration: float):
+        stall.duration = duration
+        self.stalls += 1
+        metrics.loop_stalls.inc()
+        if len(self.worst) < self.keep:
+            heapq.heappush(self.worst, stall)
+        elif stall.duration > self.worst[0].duration:
+            heapq.heapreplace(self.worst, stall)
+        log.warning("🐢 event loop stalled", extra={"lateness": duration, "reason": stall.summary()})
+
+    def _watch(self):
+        stalled_at = 0.0
+        while True:
+            time.sleep(self.interval)
+            beat = self._beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if self.current is None:
+                if blocked_for > self.threshold:
+                    self.current, stalled_at = self._capture(blocked_for), beat
+                continue
+            if beat != stalled_at:  # the loop ran again
+                self._finish(self.current, beat - stalled_at - self.interval)
+                self.current = None
+            elif self.restart_after and blocked_for > self.restart_after:
+                log.critical("💀 event loop wedged; exiting so the process is restarted",
+                             extra={"lateness": blocked_for, "reason": "".join(self.current.stack)})
+                time.sleep(0.5)  # let the log writer drain
+                os._exit(70)